@@ -5,42 +5,135 @@ Provides API endpoints for booking form and image management
 
 import os
 import sys
+import json
+import atexit
+import hashlib
+import mimetypes
 from datetime import datetime
 from functools import wraps
 
-from flask import Flask, request, jsonify, send_from_directory
+from urllib.parse import quote
+from flask import Flask, request, jsonify, send_from_directory, abort
 from flask_cors import CORS
-from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.security import safe_join
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Import our modules
-from form_processor import FormProcessor
+from form_processor import FormProcessor, BatchRowError
 from image_manager import ImageManager
+from storage import open_image_store, open_booking_store, open_replay_store
+from upload_stream import StreamingUploadRequest
+from write_behind import WriteBehindStore
+from json_provider import json_provider_class
+from compression import ResponseCompressor
+from metrics import REGISTRY, REPLAYS, instrument_app
+from slow_profiler import SlowRequestProfiler
+from idempotency import IdempotencyCache, IdempotencyError, RequestInProgress, MAX_KEY_LENGTH
+from rate_limit import RateLimiter, open_bucket_store, parse_limits
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file upload
 
+# Latency, payload size and error metrics for every request (/api/metrics).
+# PROFILE_SLOW_MS=<ms> also saves sampled stacks of slower requests to PROFILE_DIR.
+profiler = None
+if os.getenv('PROFILE_SLOW_MS'):
+    profiler = SlowRequestProfiler(
+        directory=os.getenv('PROFILE_DIR', 'profiles'),
+        threshold=float(os.getenv('PROFILE_SLOW_MS')) / 1000,
+        interval=float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+    )
+instrument_app(app, profiler)
+
+# Compact JSON (orjson when installed; JSON_ENCODER=json to force stdlib),
+# gzip/brotli-compressed when at least COMPRESS_MIN_SIZE bytes
+app.json = json_provider_class()(app)
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+compressor = ResponseCompressor(app)
+
+# Per-client budgets for the write endpoints (see rate_limit.py), answered
+# with 429 once spent. RATE_LIMIT_STORE: sqlite (shared by all workers,
+# RATE_LIMIT_DB), memory (per worker) or off. RATE_LIMITS overrides budgets;
+# TRUSTED_PROXIES=<n> reads the client address from X-Forwarded-For.
+RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'sqlite').lower()
+rate_limiter = None
+if RATE_LIMIT_STORE != 'off':
+    rate_limiter = RateLimiter(
+        app,
+        store=open_bucket_store(RATE_LIMIT_STORE, os.getenv('RATE_LIMIT_DB')),
+        limits=parse_limits(os.getenv('RATE_LIMITS', '')),
+        trusted_proxies=int(os.getenv('TRUSTED_PROXIES', 0))
+    )
+
 # Enable CORS for frontend access
 CORS(app, resources={
     r"/api/*": {
         "origins": ["*"],
         "methods": ["GET", "POST", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
+        "expose_headers": ["Idempotent-Replayed"]
     }
 })
 
-# Initialize managers
-form_processor = FormProcessor(whatsapp_number=os.getenv('WHATSAPP_NUMBER', '918840586403'))
+# Initialize managers (STORAGE_BACKEND=json|sqlite selects persistence)
+BOOKINGS_FILE = os.getenv('BOOKINGS_FILE', 'bookings.jsonl')
+booking_store = open_booking_store(bookings_file=BOOKINGS_FILE)
+
+# Booking writes go through a background writer unless BOOKING_DURABILITY=sync:
+#   enqueue - respond once the booking is queued (default)
+#   flush   - respond once the batch containing it is on disk
+BOOKING_DURABILITY = os.getenv('BOOKING_DURABILITY', 'enqueue').lower()
+if BOOKING_DURABILITY != 'sync':
+    booking_store = WriteBehindStore(booking_store, durability=BOOKING_DURABILITY)
+
+form_processor = FormProcessor(
+    whatsapp_number=os.getenv('WHATSAPP_NUMBER', '918840586403'),
+    store=booking_store
+)
+
+# Repeated booking submissions (double taps, retries) get the first answer
+# again: matched by Idempotency-Key header for IDEMPOTENCY_TTL seconds, or
+# by phone number and order fields for DUPLICATE_WINDOW seconds (0 = off)
+idempotency = IdempotencyCache(
+    open_replay_store(folder=os.path.splitext(BOOKINGS_FILE)[0] + '.replays'),
+    key_ttl=float(os.getenv('IDEMPOTENCY_TTL', 24 * 60 * 60)),
+    duplicate_ttl=float(os.getenv('DUPLICATE_WINDOW', 10 * 60))
+)
+
 image_manager = ImageManager(
     upload_folder=os.getenv('UPLOAD_FOLDER', '../uploads'),
-    metadata_file='image_metadata.json'
+    metadata_file='image_metadata.json',
+    store=open_image_store(metadata_file='image_metadata.json')
 )
 
+# Stream uploaded files to disk instead of buffering them in memory
+app.request_class = StreamingUploadRequest
+app.config['UPLOAD_TMP_FOLDER'] = image_manager.incoming_folder
+app.config['MAX_UPLOAD_SIZE'] = ImageManager.MAX_FILE_SIZE
+# Whole-request limit for /api/gallery/upload/batch (each file is still capped above)
+MAX_BATCH_UPLOAD_SIZE = int(os.getenv('MAX_BATCH_UPLOAD_SIZE', 200 * 1024 * 1024))
+
+# Uploaded files never change once written (blobs are named by content
+# hash, older uploads by unique id), so browsers may keep them for a year
+UPLOAD_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Let the front proxy push image bytes instead of a Flask worker:
+#   nginx    - X-Accel-Redirect to UPLOAD_ACCEL_PREFIX (an `internal` location)
+#   sendfile - X-Sendfile with the file path (Apache mod_xsendfile, lighttpd)
+UPLOAD_OFFLOAD = os.getenv('UPLOAD_OFFLOAD', '').lower()
+UPLOAD_ACCEL_PREFIX = os.getenv('UPLOAD_ACCEL_PREFIX', '/internal-uploads/')
+app.config['USE_X_SENDFILE'] = UPLOAD_OFFLOAD == 'sendfile'
+
+# Drain queued booking writes to disk on shutdown
+atexit.register(form_processor.bookings.close)
+atexit.register(image_manager.variants.shutdown)
+
 # Admin password from env
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'Ravi@12345')
 
@@ -63,6 +156,18 @@ def require_auth(f):
     return decorated
 
 
+def iter_ndjson_rows(stream):
+    """Parse an NDJSON request body line by line"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield BatchRowError("Invalid JSON")
+
+
 # ============== API Routes ==============
 
 @app.route('/api/health', methods=['GET'])
@@ -75,6 +180,18 @@ def health_check():
     })
 
 
+@app.route('/api/metrics', methods=['GET'])
+# @require_auth  # Uncomment for production
+def get_metrics():
+    """
+    Request and storage metrics in Prometheus text format
+    GET /api/metrics
+    """
+    return app.response_class(REGISTRY.render(),
+                              content_type='text/plain; version=0.0.4; charset=utf-8',
+                              headers={'Cache-Control': 'no-store'})
+
+
 # ============== Booking Routes ==============
 
 @app.route('/api/booking/submit', methods=['POST'])
@@ -82,7 +199,11 @@ def submit_booking():
     """
     Submit a new booking
     POST /api/booking/submit
+    Headers: Idempotency-Key (optional, unique per booking attempt)
     Body: JSON with booking form data
+    A repeat of an earlier successful submission (same key, or same phone
+    and order within DUPLICATE_WINDOW) gets the original response again,
+    with the header Idempotent-Replayed: true, and stores nothing.
     """
     try:
         data = request.get_json()
@@ -90,24 +211,73 @@ def submit_booking():
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'}), 400
         
-        # Process booking
-        result = form_processor.process_booking(data)
+        key = request.headers.get('Idempotency-Key', '').strip()
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'success': False,
+                            'error': f'Idempotency-Key is too long (max {MAX_KEY_LENGTH})'}), 400
         
-        if result['success']:
-            # Save to JSON file for records
-            form_processor.save_booking_to_json(data)
+        def handle():
+            # Process booking
+            result = form_processor.process_booking(data)
             
-            return jsonify({
+            if not result['success']:
+                return {'success': False, 'error': result['error']}, 400
+            
+            # Append to the booking journal for records; report a failed
+            # save so the client retries instead of a success being replayed
+            if not form_processor.save_booking_to_json(data):
+                return {'success': False, 'error': 'Could not save booking, please try again'}, 503
+            
+            return {
                 'success': True,
                 'whatsapp_url': result['whatsapp_url'],
                 'message': 'Booking processed successfully'
-            })
+            }, 200
+        
+        body, status, replayed = idempotency.run(key, form_processor.fingerprint(data), handle)
+        response = jsonify(body)
+        response.status_code = status
+        if replayed:
+            response.headers['Idempotent-Replayed'] = 'true'
+            REPLAYS.inc(source='key' if key else 'duplicate')
+        return response
+    
+    except IdempotencyError as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.status_code = e.status
+        if isinstance(e, RequestInProgress):
+            response.headers['Retry-After'] = '1'
+        return response
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/booking/batch', methods=['POST'])
+def submit_booking_batch():
+    """
+    Submit many bookings at once (e.g. imported from a spreadsheet)
+    POST /api/booking/batch
+    Body: JSON array of booking objects, or NDJSON (one booking per line,
+          Content-Type: application/x-ndjson)
+    All valid rows are stored in one write; results are reported per row.
+    """
+    try:
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            rows = iter_ndjson_rows(request.stream)
         else:
-            return jsonify({
-                'success': False,
-                'error': result['error']
-            }), 400
-            
+            rows = request.get_json(silent=True)
+            if not isinstance(rows, list):
+                return jsonify({'success': False, 'error': 'Expected a JSON array of bookings'}), 400
+        
+        result = form_processor.process_batch(rows)
+        
+        return jsonify({
+            'success': True,
+            'saved': result['saved'],
+            'failed': result['failed'],
+            'results': result['results']
+        })
+        
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -152,24 +322,136 @@ def preview_message():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/booking/list', methods=['GET'])
+# @require_auth  # Uncomment for production
+def list_bookings():
+    """
+    List stored bookings, newest first
+    GET /api/booking/list?phone=9876543210&status=pending&garment_type=blouse
+                         &from=2026-02-01&to=2026-02-28
+    All filters are optional; from/to are inclusive ISO dates or datetimes.
+    Optional: limit=<n> (max 100, default 20)&cursor=<next_cursor>
+    """
+    try:
+        filters = {
+            'phone': request.args.get('phone'),
+            'status': request.args.get('status'),
+            'garment_type': request.args.get('garment_type'),
+            'date_from': request.args.get('from'),
+            'date_to': request.args.get('to'),
+        }
+        page = form_processor.list_bookings(filters, request.args.get('limit', 20, type=int),
+                                            request.args.get('cursor'))
+
+        return jsonify({
+            'success': True,
+            'bookings': page['bookings'],
+            'count': len(page['bookings']),
+            'next_cursor': page['next_cursor']
+        })
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/booking/analytics', methods=['GET'])
+# @require_auth  # Uncomment for production
+def booking_analytics():
+    """
+    Booking counts for the dashboard, from precomputed rollups
+    GET /api/booking/analytics?days=30&months=12
+    Returns daily and monthly counts by garment_type and status, and the
+    open delivery backlog (overdue, due today, upcoming, unscheduled).
+    """
+    try:
+        analytics = form_processor.get_analytics(
+            days=min(request.args.get('days', 30, type=int), 366),
+            months=min(request.args.get('months', 12, type=int), 120)
+        )
+        return jsonify({'success': True, **analytics})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 # ============== Gallery/Image Routes ==============
 
 @app.route('/api/gallery/images', methods=['GET'])
 def get_images():
     """
-    Get all gallery images
+    Get gallery images
     GET /api/gallery/images?category=all
+    Optional: limit=<n>&cursor=<next_cursor> for keyset pagination,
+              fields=id,url,title to return only some fields.
+    Sends an ETag (weak once compressed); If-None-Match with it gets 304.
     """
     try:
         category = request.args.get('category', 'all')
-        images = image_manager.get_images(category)
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+        
+        # The tag changes whenever the metadata version or the query changes
+        query = f"{category}|{limit}|{cursor}|{','.join(fields)}"
+        etag = f"v{image_manager.get_version()}-" + \
+            hashlib.blake2b(query.encode('utf-8'), digest_size=8).hexdigest()
         
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        elif limit is None and cursor is None:
+            images = image_manager.get_images(category)
+            if fields:
+                images = image_manager.project_fields(images, fields)
+            response = jsonify({
+                'success': True,
+                'images': images,
+                'count': len(images)
+            })
+        else:
+            page = image_manager.get_images_page(category, limit or 20, cursor, fields)
+            response = jsonify({
+                'success': True,
+                'images': page['images'],
+                'count': len(page['images']),
+                'next_cursor': page['next_cursor']
+            })
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/gallery/search', methods=['GET'])
+def search_images():
+    """
+    Search gallery titles, descriptions and original file names
+    GET /api/gallery/search?q=bridal blouse
+    Every word must match, as a whole word or the start of one (Hindi or English).
+    Optional: category=<category>&limit=<n> (max 100, default 20)&fields=id,url,title
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': 'Search query (q) is required'}), 400
+
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+        result = image_manager.search_images(query, request.args.get('category'),
+                                             request.args.get('limit', 20, type=int), fields)
+
         return jsonify({
             'success': True,
-            'images': images,
-            'count': len(images)
+            'images': result['images'],
+            'count': len(result['images']),
+            'total': result['total']
         })
-        
+
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -188,6 +470,9 @@ def upload_image():
             return jsonify({'success': False, 'error': 'No image file provided'}), 400
         
         file = request.files['image']
+        # Too large or not an image, found while streaming it to disk
+        if getattr(file.stream, 'error', None) is not None:
+            raise file.stream.error
         category = request.form.get('category', 'other')
         title = request.form.get('title', '')
         description = request.form.get('description', '')
@@ -206,6 +491,50 @@ def upload_image():
             
     except RequestEntityTooLarge:
         return jsonify({'success': False, 'error': 'File too large (max 5MB)'}), 413
+    except UnsupportedMediaType as e:
+        return jsonify({'success': False, 'error': e.description}), 415
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/gallery/upload/batch', methods=['POST'])
+# @require_auth  # Uncomment for production
+def upload_image_batch():
+    """
+    Upload many images at once
+    POST /api/gallery/upload/batch
+    Form data: images (one field per file), category, title, description.
+    category/title/description may be given once (applies to every file)
+    or once per file, in the same order as the files.
+    All images are recorded with one metadata write; results are per file
+    (a file that is too large or not an image fails on its own).
+    """
+    try:
+        request.max_content_length = MAX_BATCH_UPLOAD_SIZE
+        files = request.files.getlist('images')
+        if not files:
+            return jsonify({'success': False, 'error': 'No image files provided'}), 400
+        
+        def field(name: str, i: int, default: str = '') -> str:
+            values = request.form.getlist(name)
+            if len(values) == len(files):
+                return values[i]
+            return values[0] if values else default
+        
+        uploads = [(file, field('category', i, 'other'), field('title', i), field('description', i))
+                   for i, file in enumerate(files)]
+        results = image_manager.save_images(uploads)
+        
+        return jsonify({
+            'success': True,
+            'saved': sum(1 for r in results if r['success']),
+            'failed': sum(1 for r in results if not r['success']),
+            'results': [{'filename': file.filename, **result} for file, result in zip(files, results)]
+        })
+        
+    except RequestEntityTooLarge:
+        max_mb = MAX_BATCH_UPLOAD_SIZE // (1024 * 1024)
+        return jsonify({'success': False, 'error': f'Upload too large (max {max_mb}MB per batch)'}), 413
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -229,6 +558,34 @@ def delete_image(image_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/gallery/delete/batch', methods=['POST'])
+# @require_auth  # Uncomment for production
+def delete_image_batch():
+    """
+    Delete many images at once
+    POST /api/gallery/delete/batch
+    Body: {"ids": ["<image_id>", ...]} (or a bare JSON array of ids)
+    All images are removed with one metadata write; results are per id.
+    """
+    try:
+        data = request.get_json(silent=True)
+        ids = data.get('ids') if isinstance(data, dict) else data
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            return jsonify({'success': False, 'error': 'Expected a list of image ids'}), 400
+        
+        results = image_manager.delete_images(ids)
+        
+        return jsonify({
+            'success': True,
+            'deleted': sum(1 for r in results if r['success']),
+            'failed': sum(1 for r in results if not r['success']),
+            'results': [{'id': image_id, **result} for image_id, result in zip(ids, results)]
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/gallery/categories', methods=['GET'])
 def get_categories():
     """Get all available categories"""
@@ -263,9 +620,29 @@ def get_whatsapp_link():
 
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    """Serve uploaded images"""
-    upload_folder = os.getenv('UPLOAD_FOLDER', '../uploads')
-    return send_from_directory(upload_folder, filename)
+    """
+    Serve uploaded images with long-lived immutable caching.
+    ETag/Last-Modified revalidation and Range requests are handled by
+    send_from_directory, or by the proxy when UPLOAD_OFFLOAD is set.
+    """
+    # Uploads still being received, lock files and other dotfiles stay private
+    if any(part.startswith('.') for part in filename.split('/')) or filename.endswith('.lock'):
+        abort(404)
+    
+    if UPLOAD_OFFLOAD == 'nginx':
+        path = safe_join(str(image_manager.upload_folder), filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = UPLOAD_ACCEL_PREFIX + quote(filename)
+    else:
+        response = send_from_directory(image_manager.upload_folder, filename,
+                                       max_age=UPLOAD_CACHE_MAX_AGE)
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = UPLOAD_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
 
 
 # ============== Error Handlers ==============
@@ -293,11 +670,17 @@ if __name__ == '__main__':
     print("=" * 50)
     print(f"\nEnvironment: {os.getenv('FLASK_ENV', 'development')}")
     print(f"Debug mode: {os.getenv('FLASK_DEBUG', 'True')}")
+    print(f"Storage backend: {os.getenv('STORAGE_BACKEND', 'json')}")
+    print(f"Booking durability: {BOOKING_DURABILITY}")
+    print(f"Rate limits: {RATE_LIMIT_STORE}")
+    print(f"JSON encoder: {type(app.json).__name__}")
     print(f"\nAvailable endpoints:")
     print(f"  Health:    http://127.0.0.1:5000/api/health")
     print(f"  Booking:   http://127.0.0.1:5000/api/booking/submit")
     print(f"  Gallery:   http://127.0.0.1:5000/api/gallery/images")
     print(f"  WhatsApp:  http://127.0.0.1:5000/api/whatsapp/link")
+    print("\nDevelopment server only. For production run:")
+    print("  gunicorn -c gunicorn.conf.py wsgi:application")
     print("\n" + "=" * 50)
     
     app.run(
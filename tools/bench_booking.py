@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Booking Benchmark for Rudransh Tailoring
+Measures bookings per second through FormProcessor.process_booking
+"""
+
+import sys
+import argparse
+import tempfile
+import timeit
+from pathlib import Path
+
+from form_processor import FormProcessor
+
+SAMPLE_BOOKING = {
+    'name': 'Priya Sharma',
+    'phone': '+91 98765-43210',
+    'email': 'priya@example.com',
+    'address': '123 Main Street, Mumbai',
+    'garment_type': 'Blouse',
+    'style': 'Princess Cut',
+    'bust': '36',
+    'waist': '30',
+    'hip': '38',
+    'shoulder': '14',
+    'arm_length': '22',
+    'garment_length': '24',
+    'sleeve_length': '6',
+    'neck_depth': '8',
+    'instructions': 'Need urgently for event',
+    'delivery_date': '2026-02-20'
+}
+
+
+def bench(func, number: int, repeat: int) -> float:
+    """Best-of-`repeat` calls per second"""
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return number / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark booking processing')
+    parser.add_argument('-n', '--number', type=int, default=20000, help='Calls per timing run')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Timing runs (best is reported)')
+    parser.add_argument('--min-rate', type=float, default=0,
+                        help='Exit with status 1 if process_booking is slower than this (bookings/s)')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("⏱️  Rudransh Tailoring - Booking Benchmark")
+    print("=" * 50)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = FormProcessor(bookings_file=str(Path(tmp) / 'bookings.jsonl'))
+
+        def process_and_save():
+            data = dict(SAMPLE_BOOKING)
+            if processor.process_booking(data)['success']:
+                processor.save_booking_to_json(data)
+
+        results = {
+            'process_booking': bench(lambda: processor.process_booking(dict(SAMPLE_BOOKING)),
+                                     args.number, args.repeat),
+            'validate_form': bench(lambda: processor.validate_form(SAMPLE_BOOKING),
+                                   args.number, args.repeat),
+            'format_whatsapp_message': bench(lambda: processor.format_whatsapp_message(SAMPLE_BOOKING),
+                                             args.number, args.repeat),
+            'process + save': bench(process_and_save, max(1, args.number // 10), args.repeat),
+        }
+        processor.bookings.close()
+
+    for name, rate in results.items():
+        print(f"  {name:<26} {rate:>12,.0f} /s")
+
+    if args.min_rate and results['process_booking'] < args.min_rate:
+        print(f"\n❌ process_booking below {args.min_rate:,.0f} bookings/s")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
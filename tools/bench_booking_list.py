@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Booking Lookup Benchmark for Rudransh Tailoring
+Time of FormProcessor.list_bookings (what GET /api/booking/list runs)
+on a large booking history, for each storage backend
+"""
+
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+GARMENTS = ['Blouse', 'Kurti', 'Salwar Suit', 'Lehenga', 'Gown', 'Other']
+
+
+def fake_bookings(count: int, customers: int) -> list:
+    """`count` bookings shaped like saved form submissions, oldest first"""
+    start = datetime(2024, 1, 1)
+    return [{
+        'name': f"Customer {n % customers}",
+        'phone': f"9{n % customers:09d}",
+        'address': '123 Main Street, Mumbai',
+        'garment_type': GARMENTS[n % len(GARMENTS)],
+        'style': 'Princess Cut',
+        'bust': '36', 'waist': '30', 'hip': '38',
+        'instructions': 'Need urgently for event',
+        'delivery_date': '2026-02-20',
+        'submitted_at': (start + timedelta(minutes=7 * n)).isoformat(),
+        'status': 'pending',
+    } for n in range(count)]
+
+
+def measure(processor, queries: list) -> float:
+    """Mean ms per list_bookings call"""
+    started = time.perf_counter()
+    for filters in queries:
+        processor.list_bookings(filters)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark booking list queries')
+    parser.add_argument('-n', '--bookings', type=int, default=100000, help='Bookings stored')
+    parser.add_argument('-c', '--customers', type=int, default=20000, help='Distinct phone numbers')
+    parser.add_argument('-r', '--repeat', type=int, default=1000, help='Queries per filter')
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from booking_journal import BookingJournal
+    from storage import SqliteBookingStore
+    from form_processor import FormProcessor
+
+    workdir = Path(tempfile.mkdtemp(prefix='rudransh-bookings-'))
+    records = fake_bookings(args.bookings, args.customers)
+    phones = [random.choice(records)['phone'] for _ in range(args.repeat)]
+    filters = [
+        ('phone', [{'phone': phone} for phone in phones]),
+        ('phone + date range', [{'phone': phone, 'date_from': '2024-06-01', 'date_to': '2025-06-30'}
+                                for phone in phones]),
+        ('garment + status', [{'garment_type': 'kurti', 'status': 'pending'}] * args.repeat),
+        ('old date range only', [{'date_from': '2024-03-01', 'date_to': '2024-03-31'}] * args.repeat),
+        ('no filter, page 1', [{}] * args.repeat),
+    ]
+
+    print("=" * 56)
+    print(f"📒 Rudransh Tailoring - Booking Lookup ({args.bookings:,} bookings)")
+    print("=" * 56)
+
+    for backend, store in (('json', BookingJournal(str(workdir / 'bookings.jsonl'), legacy_path=None)),
+                           ('sqlite', SqliteBookingStore(str(workdir / 'rudransh.db')))):
+        for i in range(0, len(records), 5000):
+            store.append_many(records[i:i + 5000])
+        processor = FormProcessor(store=store)
+
+        started = time.perf_counter()
+        processor.list_bookings({})
+        print(f"\n  {backend}: first query (index build) {(time.perf_counter() - started) * 1000:.0f} ms")
+        for name, queries in filters:
+            print(f"  {name:<22}{measure(processor, queries):>8.3f} ms")
+        store.close()
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
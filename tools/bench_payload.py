@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Payload Benchmark for Rudransh Tailoring
+Response size and server time of GET /api/gallery/images on a large gallery,
+with each JSON encoding / compression option
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+CATEGORIES = ['blouse', 'kurti', 'salwar', 'lehenga', 'gown', 'other']
+
+
+def fake_metadata(count: int) -> dict:
+    """A gallery of `count` images shaped like real ImageManager records"""
+    start = datetime(2025, 1, 1)
+    images, blobs = [], {}
+    for n in range(count):
+        blob = uuid.uuid4().hex + '.jpg'
+        stem = blob.rsplit('.', 1)[0]
+        images.append({
+            'id': uuid.uuid4().hex,
+            'title': f"डिज़ाइनर ब्लाउज़ {n}" if n % 3 == 0 else f"Designer Kurti {n}",
+            'description': 'Hand-embroidered neckline with mirror work',
+            'category': CATEGORIES[n % len(CATEGORIES)],
+            'filename': blob,
+            'blob': blob,
+            'original_filename': f"IMG_{20250101 + n}.jpg",
+            'file_path': f"../uploads/blobs/{blob}",
+            'file_size': 180000 + n,
+            'uploaded_at': (start + timedelta(minutes=n)).isoformat(),
+            'url': f"/uploads/blobs/{blob}",
+            'variants': [{'width': w, 'height': w * 4 // 3, 'format': fmt,
+                          'url': f"/uploads/blobs/{stem}-{w}w.{ext}"}
+                         for w in (320, 640, 1024) for fmt, ext in (('webp', 'webp'), ('jpeg', 'jpg'))]
+        })
+        blobs[blob] = 1
+    return {'images': images, 'blobs': blobs, 'version': 1}
+
+
+def measure(client, path: str, headers: dict, repeat: int, before=None):
+    """(body bytes, mean ms) over `repeat` requests"""
+    size, total = 0, 0.0
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        body = response.get_data()
+        total += time.perf_counter() - started
+        size = len(body)
+        assert response.status_code == 200, response.status_code
+    return size, total / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gallery JSON payloads')
+    parser.add_argument('-n', '--images', type=int, default=5000, help='Images in the gallery')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='Requests per option')
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix='rudransh-payload-'))
+    os.chdir(workdir)
+    os.environ['UPLOAD_FOLDER'] = str(workdir / 'uploads')
+    os.environ['BOOKINGS_FILE'] = str(workdir / 'bookings.jsonl')
+    os.environ['STORAGE_BACKEND'] = 'json'
+    with open('image_metadata.json', 'w', encoding='utf-8') as f:
+        json.dump(fake_metadata(args.images), f)
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from flask.json.provider import DefaultJSONProvider
+    from json_provider import CompactJSONProvider, OrjsonProvider, orjson
+    from compression import brotli
+    import app as server
+
+    client = server.app.test_client()
+    path = '/api/gallery/images'
+    identity = {'Accept-Encoding': 'identity'}
+    clear = server.compressor._cache.clear
+
+    class IndentedJSONProvider(DefaultJSONProvider):
+        compact = False  # what the debug-mode dev server used to send
+
+    options = [
+        ('indented (before)', IndentedJSONProvider, identity, None),
+        ('compact json', CompactJSONProvider, identity, None),
+    ]
+    if orjson:
+        options.append(('compact orjson', OrjsonProvider, identity, None))
+    fastest = OrjsonProvider if orjson else CompactJSONProvider
+    options += [
+        ('+ gzip', fastest, {'Accept-Encoding': 'gzip'}, clear),
+        ('+ gzip (cached)', fastest, {'Accept-Encoding': 'gzip'}, None),
+    ]
+    if brotli:
+        options += [
+            ('+ br', fastest, {'Accept-Encoding': 'br'}, clear),
+            ('+ br (cached)', fastest, {'Accept-Encoding': 'br'}, None),
+        ]
+
+    print("=" * 56)
+    print(f"📦 Rudransh Tailoring - Gallery Payload ({args.images:,} images)")
+    print("=" * 56)
+    print(f"  {'option':<20}{'bytes':>14}{'vs before':>11}{'ms':>10}")
+
+    baseline = None
+    for name, provider, headers, before in options:
+        server.app.json = provider(server.app)
+        size, ms = measure(client, path, headers, args.repeat, before)
+        baseline = baseline or size
+        print(f"  {name:<20}{size:>14,}{size / baseline:>10.1%}{ms:>10.1f}")
+
+    server.form_processor.bookings.close()
+    os.chdir('/')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
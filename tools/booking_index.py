@@ -0,0 +1,208 @@
+"""
+Booking Index for Rudransh Tailoring
+In-memory secondary indexes (phone, status, garment type) over the booking journal
+"""
+
+import json
+import bisect
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+from file_lock import file_lock
+
+LEGACY, SNAPSHOT, JOURNAL = 0, 1, 2
+
+
+def phone_key(phone: Any) -> str:
+    """Lookup key for a phone number: its last 10 digits ('+91 98765-43210' -> '9876543210')"""
+    return ''.join(ch for ch in str(phone or '') if ch.isdigit())[-10:]
+
+
+def match_filters(phone: str, status: str, garment: str, submitted_at: str,
+                  filters: Dict[str, str]) -> bool:
+    """
+    Check one booking's indexed fields against query filters
+    (phone, status, garment_type: exact; date_from/date_to: inclusive prefixes)
+    """
+    if 'phone' in filters and phone != filters['phone']:
+        return False
+    if 'status' in filters and status != filters['status']:
+        return False
+    if 'garment_type' in filters and garment != filters['garment_type']:
+        return False
+    if 'date_from' in filters and submitted_at < filters['date_from']:
+        return False
+    if 'date_to' in filters and submitted_at[:len(filters['date_to'])] > filters['date_to']:
+        return False
+    return True
+
+
+class BookingIndex:
+    """
+    Secondary indexes over a BookingJournal, kept in memory.
+
+    Each booking is identified by its position in the journal's reading
+    order (legacy file, snapshot, journal), which compaction preserves;
+    its id is that position + 1. Per booking only the file offset and the
+    indexed fields are held, so 100k bookings cost a few MB; full records
+    are read back from disk for the page being returned.
+
+    Bookings are stored roughly in submission order, so date filters
+    are served by bisecting two running bounds: the latest `submitted_at`
+    up to each position and the earliest from each position on (exact
+    even where concurrent writers appended slightly out of order).
+
+    Every query first tails the journal from the last offset seen, so
+    bookings appended by any process are visible. A compaction (new
+    snapshot, truncated journal) triggers a full rebuild.
+    """
+
+    def __init__(self, journal):
+        self.journal = journal
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Per booking: (source, offset, phone key, status, garment type, submitted_at)
+        self.entries: List[Tuple[int, int, str, str, str, str]] = []
+        self.by_phone: Dict[str, List[int]] = {}
+        self.by_status: Dict[str, List[int]] = {}
+        self.by_garment: Dict[str, List[int]] = {}
+        # Latest submitted_at of entries[:i + 1] / earliest of entries[i:]
+        self.max_submitted: List[str] = []
+        self.min_submitted: List[str] = []
+        self._legacy: List[Dict[str, Any]] = []
+        self._signature = None
+        self._journal_offset = 0
+
+    # ---------- Maintenance ----------
+
+    def refresh(self):
+        """Bring the index up to date with the files (caller holds the journal lock)"""
+        signature, size = self.journal.files_signature()
+        first_new = len(self.entries)
+
+        if signature != self._signature or size < self._journal_offset:
+            self._reset()
+            first_new = 0
+            self._signature = signature
+            self._legacy = list(self.journal._iter_legacy())
+            for offset, record in enumerate(self._legacy):
+                self._add(LEGACY, offset, record)
+            self._scan(self.journal.snapshot_path, SNAPSHOT, 0)
+        if size > self._journal_offset:
+            self._journal_offset = self._scan(self.journal.path, JOURNAL, self._journal_offset)
+        self._update_min_submitted(first_new)
+
+    def _update_min_submitted(self, first_new: int):
+        """Fold entries from `first_new` on into the earliest-from-here bounds"""
+        bounds = self.min_submitted
+        lowest = None
+        for seq in range(len(bounds) - 1, first_new - 1, -1):
+            if lowest is None or bounds[seq] < lowest:
+                lowest = bounds[seq]
+            bounds[seq] = lowest
+        # Earlier bounds only change where a new booking is older than them
+        seq = first_new - 1
+        while lowest is not None and seq >= 0 and bounds[seq] > lowest:
+            bounds[seq] = lowest
+            seq -= 1
+
+    def _scan(self, path: Path, source: int, start: int) -> int:
+        """Index complete lines from `start`; returns the offset after the last one"""
+        offset = start
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return offset
+        with f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # still being written; picked up next time
+                stripped = line.strip()
+                if stripped:
+                    try:
+                        self._add(source, offset, json.loads(stripped))
+                    except ValueError:
+                        pass  # torn line, skipped like BookingJournal.iter_records does
+                offset += len(line)
+        return offset
+
+    def _add(self, source: int, offset: int, record: Dict[str, Any]):
+        seq = len(self.entries)
+        phone = phone_key(record.get('phone'))
+        status = str(record.get('status') or '').lower()
+        garment = str(record.get('garment_type') or '').lower()
+        submitted_at = str(record.get('submitted_at') or '')
+        self.entries.append((source, offset, phone, status, garment, submitted_at))
+        self.max_submitted.append(max(self.max_submitted[-1], submitted_at) if seq else submitted_at)
+        self.min_submitted.append(submitted_at)  # made a running bound by refresh()
+        self.by_phone.setdefault(phone, []).append(seq)
+        self.by_status.setdefault(status, []).append(seq)
+        self.by_garment.setdefault(garment, []).append(seq)
+
+    # ---------- Queries ----------
+
+    def query(self, filters: Dict[str, str], limit: int = 20,
+              before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` bookings matching `filters` with id < `before`, newest first
+        """
+        with file_lock(self.journal.path, shared=True), self._lock:
+            self.refresh()
+
+            # Positions that can fall inside the date range and before the cursor
+            low, high = 0, len(self.entries)
+            if 'date_from' in filters:
+                low = bisect.bisect_left(self.max_submitted, filters['date_from'])
+            if 'date_to' in filters:
+                # Inclusive: '2026-02-20' also matches '2026-02-20T18:30:00'
+                high = bisect.bisect_right(self.min_submitted, filters['date_to'] + '\uffff')
+            if before is not None:
+                high = min(high, before - 1)
+
+            # Walk the shortest matching index within those positions;
+            # check the other filters per entry
+            candidates, start, end = range(len(self.entries)), low, max(low, high)
+            for field, index in (('phone', self.by_phone), ('status', self.by_status),
+                                 ('garment_type', self.by_garment)):
+                if field in filters:
+                    seqs = index.get(filters[field], [])
+                    i, j = bisect.bisect_left(seqs, low), bisect.bisect_left(seqs, high)
+                    if j - i < end - start:
+                        candidates, start, end = seqs, i, max(i, j)
+
+            matched = []
+            for i in range(end - 1, start - 1, -1):
+                seq = candidates[i]
+                _, _, phone, status, garment, submitted_at = self.entries[seq]
+                if match_filters(phone, status, garment, submitted_at, filters):
+                    matched.append(seq)
+                    if len(matched) >= limit:
+                        break
+
+            return self._load(matched)
+
+    def _load(self, seqs: List[int]) -> List[Dict[str, Any]]:
+        """Read full records back from disk"""
+        files = {}
+        records = []
+        try:
+            for seq in seqs:
+                source, offset = self.entries[seq][:2]
+                if source == LEGACY:
+                    record = self._legacy[offset]
+                else:
+                    if source not in files:
+                        path = self.journal.snapshot_path if source == SNAPSHOT else self.journal.path
+                        files[source] = open(path, 'rb')
+                    f = files[source]
+                    f.seek(offset)
+                    record = json.loads(f.readline())
+                records.append({'id': seq + 1, **record})
+        finally:
+            for f in files.values():
+                f.close()
+        return records
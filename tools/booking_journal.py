@@ -0,0 +1,340 @@
+"""
+Booking Journal for Rudransh Tailoring
+Append-only, line-delimited JSON storage for booking records
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from booking_index import BookingIndex
+from booking_rollups import Rollups, count_booking, compute_rollups, copy_rollups, empty_rollups
+from file_lock import file_lock, atomic_write_json
+from metrics import timed
+
+# Journal growth after which rollups() saves a new checkpoint
+ROLLUPS_CHECKPOINT_BYTES = 1024 * 1024
+
+
+class BookingJournal:
+    """
+    Append-only booking store.
+
+    Every booking is written as one JSON line at the end of the journal
+    file, so a submit costs the same no matter how many bookings exist.
+    fsync is batched: the journal is flushed to disk after `fsync_every`
+    records or `fsync_interval` seconds, whichever comes first.
+    `compact()` folds the journal into a snapshot file (also one record
+    per line) so the journal itself stays short.
+
+    Appends hold a shared lock on `<journal>.lock` and compaction holds
+    it exclusively, so a compaction in one process never truncates
+    records another process is writing.
+
+    Analytics rollups (see booking_rollups.py) are kept in memory and
+    brought up to date on read by counting the journal lines appended
+    since, the way BookingIndex follows the journal; appends do no extra
+    work. `<journal>.rollups.json` is a checkpoint of the counters and the
+    journal offset they cover, so a new process only counts the tail.
+    """
+
+    def __init__(self, path: str = "bookings.jsonl", snapshot_path: Optional[str] = None,
+                 legacy_path: Optional[str] = "bookings.json",
+                 fsync_every: int = 16, fsync_interval: float = 1.0):
+        self.path = Path(path)
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else \
+            self.path.with_name(self.path.stem + '.snapshot.jsonl')
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self.rollups_path = self.path.with_name(self.path.stem + '.rollups.json')
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._index: Optional[BookingIndex] = None
+        # (files signature, journal offset counted up to, rollups)
+        self._rollups_state = (None, 0, None)
+        self._rollups_lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    # ---------- Writing ----------
+
+    def _open(self) -> int:
+        """Open the journal for appending (lazily, once per process)"""
+        if self._fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    @staticmethod
+    def _encode(record: Dict[str, Any]) -> bytes:
+        """Serialize one record as a single journal line"""
+        return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+    @timed('booking_write')
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Append one record to the journal.
+        The line is written with a single O_APPEND write, so concurrent
+        writers never interleave or overwrite each other's records.
+        """
+        line = self._encode(record)
+        with self._lock, file_lock(self.path, shared=True):
+            os.write(self._open(), line)
+            self._pending += 1
+            self._maybe_sync()
+
+    @timed('booking_write')
+    def append_many(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Append a batch of records with one write and one fsync
+        """
+        if not records:
+            return
+        data = b''.join(self._encode(record) for record in records)
+        with self._lock, file_lock(self.path, shared=True):
+            fd = self._open()
+            view = memoryview(data)
+            while view:
+                written = os.write(fd, view)
+                view = view[written:]
+            self._pending += len(records)
+            self._sync()
+
+    def _maybe_sync(self):
+        """fsync when enough records or enough time has accumulated"""
+        if (self._pending >= self.fsync_every or
+                time.monotonic() - self._last_sync >= self.fsync_interval):
+            self._sync()
+
+    def _sync(self):
+        if self._fd is not None and self._pending:
+            os.fsync(self._fd)
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def flush(self) -> None:
+        """Force any unsynced records to disk"""
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        """Flush and close the journal file"""
+        with self._lock:
+            self._sync()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    # ---------- Rollups ----------
+
+    def files_signature(self) -> Tuple[list, int]:
+        """
+        ([legacy stat, snapshot stat, journal inode], journal size).
+        The signature changes when a compaction replaces the files the
+        journal offsets refer to.
+        """
+        def stat(path: Optional[Path]):
+            try:
+                st = os.stat(path) if path else None
+            except FileNotFoundError:
+                return None
+            return [st.st_ino, st.st_mtime_ns, st.st_size] if st else None
+
+        journal = stat(self.path)
+        return ([stat(self.legacy_path), stat(self.snapshot_path), journal[0] if journal else None],
+                journal[2] if journal else 0)
+
+    def _iter_tail(self, start: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(offset after the line, record) for complete journal lines from `start`"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # still being written; counted next time
+                offset += len(line)
+                stripped = line.strip()
+                if stripped:
+                    try:
+                        yield offset, json.loads(stripped)
+                    except ValueError:
+                        pass  # torn line, skipped like iter_records does
+
+    def _load_rollups_checkpoint(self, signature: list, size: int):
+        """(offset, rollups) from the checkpoint file if it matches the files, else None"""
+        try:
+            with open(self.rollups_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint['signature'] == signature and checkpoint['offset'] <= size:
+                return checkpoint['offset'], checkpoint['rollups']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # missing, or empty after a crash (written without fsync)
+        return None
+
+    def _save_rollups_checkpoint(self, signature: list, offset: int, rollups: Rollups):
+        # Derived data, rebuilt if lost, so no fsync
+        try:
+            with file_lock(self.rollups_path):
+                atomic_write_json(self.rollups_path,
+                                  {'signature': signature, 'offset': offset, 'rollups': rollups},
+                                  fsync=False, ensure_ascii=False, separators=(',', ':'))
+        except OSError as e:
+            print(f"Error saving booking rollups: {e}")
+
+    def rollups(self) -> Rollups:
+        """
+        Booking counters per day, month and delivery date.
+        The result is shared; callers must not modify it.
+        """
+        with file_lock(self.path, shared=True), self._rollups_lock:
+            signature, size = self.files_signature()
+            state_signature, offset, rollups = self._rollups_state
+            checkpoint_offset = offset
+
+            if state_signature != signature or size < offset:
+                loaded = self._load_rollups_checkpoint(signature, size)
+                if loaded is None:
+                    # Legacy file and snapshot in full; the journal is the tail below
+                    offset, checkpoint_offset = 0, -1
+                    rollups = compute_rollups(
+                        record for source in (self._iter_legacy(), self._iter_lines(self.snapshot_path))
+                        for record in source)
+                else:
+                    offset, rollups = loaded
+                    checkpoint_offset = offset
+
+            if size > offset:
+                # Readers may hold the current dict; count into a copy
+                rollups = copy_rollups(rollups)
+                for offset, record in self._iter_tail(offset):
+                    count_booking(rollups, record)
+
+            self._rollups_state = (signature, offset, rollups)
+            if offset - checkpoint_offset >= ROLLUPS_CHECKPOINT_BYTES or checkpoint_offset < 0:
+                self._save_rollups_checkpoint(signature, offset, rollups)
+            return rollups
+
+    def rebuild_rollups(self) -> Rollups:
+        """Recompute the rollups (and their checkpoint) from every booking"""
+        with self._rollups_lock:
+            self._rollups_state = (None, 0, None)
+        with file_lock(self.rollups_path):
+            try:
+                os.unlink(self.rollups_path)
+            except FileNotFoundError:
+                pass
+        return self.rollups()
+
+    # ---------- Reading ----------
+
+    @staticmethod
+    def _iter_lines(path: Path) -> Iterator[Dict[str, Any]]:
+        """Stream records from a line-delimited JSON file"""
+        try:
+            f = open(path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; skip it
+                    continue
+
+    def _iter_legacy(self) -> Iterator[Dict[str, Any]]:
+        """Records from the old whole-file bookings.json, if still present"""
+        if not self.legacy_path or not self.legacy_path.exists():
+            return
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                bookings = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return
+        yield from bookings
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every booking, oldest first, one record at a time.
+        Order: legacy bookings.json, snapshot, then the live journal.
+        """
+        yield from self._iter_legacy()
+        yield from self._iter_lines(self.snapshot_path)
+        yield from self._iter_lines(self.path)
+
+    def query(self, filters: Dict[str, str], limit: int = 20,
+              before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` bookings matching `filters` with id < `before`, newest first.
+        Served from an in-memory BookingIndex built on first use.
+        """
+        if self._index is None:
+            self._index = BookingIndex(self)
+        return self._index.query(filters, limit, before)
+
+    # ---------- Compaction ----------
+
+    def compact(self) -> int:
+        """
+        Fold legacy file, snapshot and journal into a new snapshot,
+        then truncate the journal.
+        Returns: number of records in the new snapshot
+        """
+        with self._lock, file_lock(self.path):
+            self._sync()
+            tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+            count = 0
+
+            rollups = empty_rollups()
+            with open(tmp_path, 'wb') as out:
+                for record in self.iter_records():
+                    out.write(self._encode(record))
+                    count_booking(rollups, record)
+                    count += 1
+                out.flush()
+                os.fsync(out.fileno())
+
+            os.replace(tmp_path, self.snapshot_path)
+
+            # Everything is in the snapshot now; start an empty journal
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            with open(self.path, 'wb') as f:
+                os.fsync(f.fileno())
+
+            # Keep the old whole-file store around, but stop reading it
+            if self.legacy_path and self.legacy_path.exists():
+                os.replace(self.legacy_path, self.legacy_path.with_name(self.legacy_path.name + '.bak'))
+
+            # Counted on the way through; saves the next read a full scan
+            signature, _ = self.files_signature()
+            self._save_rollups_checkpoint(signature, 0, rollups)
+            return count
+
+
+# For direct testing / maintenance
+if __name__ == "__main__":
+    import sys
+
+    journal = BookingJournal()
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'compact':
+        total = journal.compact()
+        print(f"✅ Compacted {total} booking(s) into {journal.snapshot_path}")
+    else:
+        total = sum(1 for _ in journal.iter_records())
+        print(f"📒 {total} booking(s) in {journal.path}")
+        print("Run with 'compact' to fold the journal into a snapshot")
@@ -0,0 +1,134 @@
+"""
+Booking Rollups for Rudransh Tailoring
+Booking counters per day, month and delivery date, so reports need not scan
+every booking: the SQLite backend updates them with each insert, the journal
+counts its new lines when they are read (from a checkpoint saved every 1 MB)
+"""
+
+from datetime import date
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+
+# Bookings in these states no longer count towards the delivery backlog
+CLOSED_STATUSES = frozenset({'completed', 'delivered', 'cancelled'})
+
+# rollups[period][bucket][dimension][value] -> count
+#   period 'daily' (YYYY-MM-DD) / 'monthly' (YYYY-MM): dimensions total, garment_type, status
+#   period 'delivery' (delivery date, '' if none): dimension status
+Rollups = Dict[str, Dict[str, Dict[str, Dict[str, int]]]]
+RollupKey = Tuple[str, str, str, str]
+
+
+def empty_rollups() -> Rollups:
+    return {'daily': {}, 'monthly': {}, 'delivery': {}}
+
+
+def copy_rollups(rollups: Rollups) -> Rollups:
+    """Deep copy, so the counters can change while others read the original"""
+    return {period: {bucket: {dimension: dict(values) for dimension, values in counts.items()}
+                     for bucket, counts in buckets.items()}
+            for period, buckets in rollups.items()}
+
+
+def rollup_keys(record: Dict[str, Any]) -> Iterator[RollupKey]:
+    """The (period, bucket, dimension, value) counters one booking contributes to"""
+    submitted = str(record.get('submitted_at') or '')
+    garment = str(record.get('garment_type') or '').strip().lower()
+    status = str(record.get('status') or '').strip().lower()
+    for period, bucket in (('daily', submitted[:10]), ('monthly', submitted[:7])):
+        yield period, bucket, 'total', 'all'
+        yield period, bucket, 'garment_type', garment
+        yield period, bucket, 'status', status
+    yield 'delivery', str(record.get('delivery_date') or '').strip()[:10], 'status', status
+
+
+def add_count(rollups: Rollups, key: RollupKey, count: int):
+    """Adjust one counter, dropping it once it reaches zero"""
+    period, bucket, dimension, value = key
+    values = rollups[period].setdefault(bucket, {}).setdefault(dimension, {})
+    values[value] = values.get(value, 0) + count
+    if values[value] <= 0:
+        del values[value]
+        if not values:
+            del rollups[period][bucket][dimension]
+            if not rollups[period][bucket]:
+                del rollups[period][bucket]
+
+
+def count_booking(rollups: Rollups, record: Dict[str, Any], sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) one booking"""
+    for key in rollup_keys(record):
+        add_count(rollups, key, sign)
+
+
+def compute_rollups(records: Iterable[Dict[str, Any]]) -> Rollups:
+    """Rollups from scratch, one record at a time (works on a streamed history)"""
+    rollups = empty_rollups()
+    for record in records:
+        count_booking(rollups, record)
+    return rollups
+
+
+def summarize(rollups: Rollups, since_day: str = '', since_month: str = '',
+              today: str = '') -> Dict[str, Any]:
+    """
+    Dashboard view of the rollups
+    Returns: {
+        'daily': [{'date', 'total', 'garment_type': {...}, 'status': {...}}, ...],
+        'monthly': [{'month', 'total', 'garment_type': {...}, 'status': {...}}, ...],
+        'backlog': {'open', 'overdue', 'due_today', 'unscheduled',
+                    'upcoming': [{'date', 'count'}, ...]}
+    }
+    Days and months are oldest first; those without bookings are left out.
+    """
+    today = today or date.today().isoformat()
+
+    def series(period: str, label: str, since: str) -> List[Dict[str, Any]]:
+        return [{label: bucket,
+                 'total': counts.get('total', {}).get('all', 0),
+                 'garment_type': counts.get('garment_type', {}),
+                 'status': counts.get('status', {})}
+                for bucket, counts in sorted(rollups[period].items()) if bucket >= since]
+
+    backlog = {'open': 0, 'overdue': 0, 'due_today': 0, 'unscheduled': 0, 'upcoming': []}
+    for delivery, counts in sorted(rollups['delivery'].items()):
+        open_count = sum(n for status, n in counts.get('status', {}).items()
+                         if status not in CLOSED_STATUSES)
+        if not open_count:
+            continue
+        backlog['open'] += open_count
+        if not delivery:
+            backlog['unscheduled'] += open_count
+        elif delivery < today:
+            backlog['overdue'] += open_count
+        elif delivery == today:
+            backlog['due_today'] += open_count
+        else:
+            backlog['upcoming'].append({'date': delivery, 'count': open_count})
+
+    return {
+        'daily': series('daily', 'date', since_day),
+        'monthly': series('monthly', 'month', since_month),
+        'backlog': backlog
+    }
+
+
+# Rebuild from the raw bookings of the configured backend (STORAGE_BACKEND)
+if __name__ == "__main__":
+    import os
+    import sys
+    from storage import open_booking_store
+
+    store = open_booking_store(bookings_file=os.getenv('BOOKINGS_FILE', 'bookings.jsonl'))
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        rollups = store.rebuild_rollups()
+        print("✅ Rebuilt booking rollups from the stored bookings")
+    else:
+        rollups = store.rollups()
+        print("Run with 'rebuild' to recompute the rollups from the stored bookings")
+
+    backlog = summarize(rollups)['backlog']
+    total = sum(counts['total']['all'] for counts in rollups['monthly'].values())
+    print(f"📊 {total} booking(s) in {len(rollups['monthly'])} month(s); "
+          f"{backlog['open']} open, {backlog['overdue']} overdue")
+    store.close()
@@ -0,0 +1,106 @@
+"""
+Response Compression for Rudransh Tailoring
+Negotiated gzip/brotli encoding of JSON API responses
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from flask import request
+
+# brotli is optional: without it only gzip is offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson')
+
+
+class ResponseCompressor:
+    """
+    after_request hook that compresses JSON bodies of at least `min_size`
+    bytes with the best encoding the client accepts (br, then gzip).
+
+    Responses with a strong ETag (the gallery listing) are the same bytes
+    until the metadata changes, so their compressed bodies are kept in a
+    small LRU keyed by (ETag, encoding) and reused across requests.
+    The ETag is made weak once the body is encoded, as nginx does.
+    """
+
+    def __init__(self, app=None, min_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 5, cache_size: int = 32):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple[str, str], bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', self.min_size)
+        app.after_request(self.compress)
+
+    @property
+    def encodings(self) -> Tuple[str, ...]:
+        return ('br', 'gzip') if brotli else ('gzip',)
+
+    def choose_encoding(self) -> Optional[str]:
+        """Best encoding from the request's Accept-Encoding, or None"""
+        accepted = request.accept_encodings
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accepted[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def encode(self, data: bytes, encoding: str) -> bytes:
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or
+                response.mimetype not in COMPRESSIBLE_TYPES or
+                'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag and not weak else None
+        body = self._cached(key) if key else None
+        if body is None:
+            body = self.encode(data, encoding)
+            if key:
+                self._store(key, body)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _cached(self, key) -> Optional[bytes]:
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _store(self, key, body: bytes):
+        with self._lock:
+            self._cache[key] = body
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
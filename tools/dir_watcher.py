@@ -0,0 +1,143 @@
+"""
+Directory Watcher for Rudransh Tailoring
+Blocks until files in a folder change (inotify on Linux, polling elsewhere)
+"""
+
+import os
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple
+
+# inotify event flags (linux/inotify.h)
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+def _load_inotify():
+    """libc with inotify support, or None"""
+    if not hasattr(os, 'O_NONBLOCK'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    except OSError:
+        return None
+    if not (hasattr(libc, 'inotify_init1') and hasattr(libc, 'inotify_add_watch')):
+        return None
+    return libc
+
+
+class DirectoryWatcher:
+    """
+    Wait for changes to matching files in one directory.
+
+    With inotify the process sleeps in select() until the kernel reports
+    an event, so idle CPU is zero. Elsewhere the folder is polled with
+    stat() only. Bursts of events (a batch copy, an editor saving) are
+    debounced: `wait()` returns once no event arrived for `debounce`
+    seconds.
+    """
+
+    def __init__(self, path, match: Callable[[str], bool] = lambda name: True,
+                 debounce: float = 0.25, poll_interval: float = 1.0):
+        self.path = Path(path)
+        self.match = match
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+
+        libc = _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, str(self.path).encode(), IN_WATCH_MASK) >= 0:
+                self._fd = fd
+            elif fd >= 0:
+                os.close(fd)
+
+        if self._fd is None:
+            self._snapshot = self._scan()
+
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self._fd is not None else 'polling'
+
+    def wait(self) -> Set[str]:
+        """Block until matching files change; returns the changed names"""
+        if self._fd is not None:
+            return self._wait_inotify()
+        return self._wait_polling()
+
+    # ---------- inotify ----------
+
+    def _read_events(self) -> Set[str]:
+        names = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+            if name and self.match(name):
+                names.add(name)
+        return names
+
+    def _wait_inotify(self) -> Set[str]:
+        changed = set()
+        while not changed:
+            select.select([self._fd], [], [])
+            changed |= self._read_events()
+
+        # Debounce: keep collecting until the folder is quiet
+        while select.select([self._fd], [], [], self.debounce)[0]:
+            changed |= self._read_events()
+        return changed
+
+    # ---------- polling fallback ----------
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if self.match(entry.name) and entry.is_file():
+                    st = entry.stat()
+                    snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def _diff(self) -> Set[str]:
+        current = self._scan()
+        previous, self._snapshot = self._snapshot, current
+        return {name for name in previous.keys() | current.keys()
+                if previous.get(name) != current.get(name)}
+
+    def _wait_polling(self) -> Set[str]:
+        changed = set()
+        while not changed:
+            time.sleep(self.poll_interval)
+            changed = self._diff()
+
+        while True:
+            time.sleep(self.debounce)
+            more = self._diff()
+            if not more:
+                return changed
+            changed |= more
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,76 @@
+"""
+File Locking for Rudransh Tailoring
+Cross-process advisory locks and crash-safe JSON writes
+"""
+
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+# fcntl is POSIX-only; on Windows the locks below are no-ops
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Process umask, read once (os.umask can only be read by setting it)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Mode of a newly created file (mkstemp alone gives 0600)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+@contextmanager
+def file_lock(path, shared: bool = False):
+    """
+    Hold an advisory lock on `<path>.lock` for the duration of the block.
+    Exclusive by default; shared locks can be held by many processes at once.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    lock_path = Path(str(path) + '.lock')
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+def atomic_write_json(path, data: Any, fsync: bool = True, **dump_kwargs):
+    """
+    Write JSON so readers see either the old or the new file, never a
+    truncated one: write a temp file in the same folder, fsync it, then
+    os.replace() it over the target.
+    fsync=False skips the disk flush for data that can be recomputed; a
+    crash may then leave an empty file, but never a half-written one
+    while the system stays up.
+    The new file keeps the permissions of the one it replaces (a new file
+    gets the usual 0666 minus umask rather than mkstemp's 0600).
+    """
+    path = Path(path)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent or '.', prefix=path.name + '.', suffix='.tmp')
+    try:
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            # dumps() + one write: json.dump() encodes chunk by chunk in Python
+            f.write(json.dumps(data, **dump_kwargs))
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
@@ -4,106 +4,184 @@ Handles booking form submissions and generates WhatsApp messages
 """
 
 import json
-import urllib.parse
-from datetime import datetime
-from typing import Dict, Any
+import base64
+import string
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Iterable, Optional
+
+from booking_index import phone_key
+from booking_rollups import summarize
+from booking_journal import BookingJournal
+from metrics import timed
+
+
+# Message layout, compiled once; measurement lines are filled in per booking
+MESSAGE_TEMPLATE = """*New Booking - Rudransh Tailoring*
+*Date:* {now}
+
+*Customer Details:*
+👤 Name: {name}
+📞 Phone: {phone}
+🏠 Address: {address}
+📧 Email: {email}
+
+*Order Details:*
+👗 Garment Type: {garment_type}
+✂️ Style/Design: {style}
+📏 Measurements:
+{measurements}
+*Additional Info:*
+📝 Special Instructions: {instructions}
+📅 Preferred Delivery: {delivery_date}
+
+Thank you for choosing Rudransh Tailoring! 🙏
+Please confirm my booking."""
+
+# (form field, label) for each optional measurement, in message order
+MEASUREMENT_FIELDS = (
+    ('bust', 'Bust'),
+    ('waist', 'Waist'),
+    ('hip', 'Hip'),
+    ('shoulder', 'Shoulder'),
+    ('arm_length', 'Arm Length'),
+    ('garment_length', 'Garment Length'),
+    ('sleeve_length', 'Sleeve Length'),
+    ('neck_depth', 'Neck Depth'),
+)
+
+REQUIRED_FIELDS = (
+    ('name', 'Name'),
+    ('phone', 'Phone'),
+    ('address', 'Address'),
+    ('garment_type', 'Garment Type'),
+)
+
+NO_MEASUREMENTS = "   • No measurements provided\n"
+
+# Fields that, with the phone number, identify an order when spotting repeats
+ORDER_FIELDS = ('name', 'garment_type', 'style', *(field for field, _ in MEASUREMENT_FIELDS),
+                'instructions', 'delivery_date')
+
+
+class BatchRowError:
+    """Placeholder for a batch row that could not be parsed"""
+    
+    def __init__(self, error: str):
+        self.error = error
+
+
+# Byte -> percent-escape table; same output as urllib.parse.quote(text, safe='/')
+# but str.translate does the work in C instead of one Python call per byte
+_SAFE_BYTES = frozenset(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~/')
+_QUOTE_TABLE = {b: (chr(b) if b in _SAFE_BYTES else f'%{b:02X}') for b in range(256)}
+
+
+def quote_message(text: str) -> str:
+    """URL-encode a message for the wa.me text parameter"""
+    return text.encode('utf-8').decode('latin-1').translate(_QUOTE_TABLE)
+
+
+# The template split into (literal, field) pairs with each literal already
+# URL-encoded, so per booking only the short field values need encoding
+_TEMPLATE_PARTS = tuple(
+    (literal, quote_message(literal), field)
+    for literal, field, _, _ in string.Formatter().parse(MESSAGE_TEMPLATE)
+)
 
 
 class FormProcessor:
     """Process booking form data and generate WhatsApp messages"""
     
-    def __init__(self, whatsapp_number: str = "918840586403"):
+    MAX_PAGE_SIZE = 100
+    
+    def __init__(self, whatsapp_number: str = "918840586403", bookings_file: str = "bookings.jsonl",
+                 store=None):
         self.whatsapp_number = whatsapp_number
-        
-    def validate_form(self, data: Dict[str, Any]) -> tuple[bool, str]:
+        self.url_prefix = f"https://wa.me/{whatsapp_number}?text="
+        # Booking backend (see storage.py); append-only journal by default
+        self.bookings = store or BookingJournal(bookings_file)
+    
+    def _check(self, data: Dict[str, Any]) -> tuple[str, str]:
         """
-        Validate booking form data
-        Returns: (is_valid, error_message)
+        Validate in one pass
+        Returns: (error_message, normalized 10-digit phone); error is "" if valid
         """
-        required_fields = ['name', 'phone', 'address', 'garment_type']
-        
-        for field in required_fields:
-            if not data.get(field) or not str(data[field]).strip():
-                return False, f"{field.replace('_', ' ').title()} is required"
+        for field, label in REQUIRED_FIELDS:
+            value = data.get(field)
+            if not value or not str(value).strip():
+                return f"{label} is required", ""
         
         # Validate phone number (Indian format)
-        phone = str(data['phone']).strip()
-        phone_digits = ''.join(filter(str.isdigit, phone))
+        phone_digits = ''.join(filter(str.isdigit, str(data['phone'])))
         
         if len(phone_digits) < 10:
-            return False, "Phone number must have at least 10 digits"
+            return "Phone number must have at least 10 digits", ""
         
         if len(phone_digits) > 10:
             # Remove country code if present
             if phone_digits.startswith('91') and len(phone_digits) == 12:
                 phone_digits = phone_digits[2:]
             else:
-                return False, "Invalid phone number format"
+                return "Invalid phone number format", ""
         
         # Check if phone starts with valid digit (6-9)
         if phone_digits[0] not in '6789':
-            return False, "Phone number must start with 6, 7, 8, or 9"
+            return "Phone number must start with 6, 7, 8, or 9", ""
         
-        return True, ""
+        return "", phone_digits
+        
+    def validate_form(self, data: Dict[str, Any]) -> tuple[bool, str]:
+        """
+        Validate booking form data
+        Returns: (is_valid, error_message)
+        """
+        error, _ = self._check(data)
+        return not error, error
     
-    def format_whatsapp_message(self, data: Dict[str, Any]) -> str:
+    def _render(self, data: Dict[str, Any], encode: bool = True) -> tuple[str, str]:
         """
-        Format form data into a WhatsApp message
+        Build the WhatsApp message and its URL-encoded form in one pass
+        Returns: (message, encoded_message); encoded is "" if encode=False
         """
-        now = datetime.now().strftime("%d/%m/%Y, %I:%M:%S %p")
+        get = data.get
+        measurements = ''.join(
+            f"   • {label}: {get(field)} inches\n" for field, label in MEASUREMENT_FIELDS if get(field)
+        ) or NO_MEASUREMENTS
         
-        message = f"""*New Booking - Rudransh Tailoring*
-*Date:* {now}
-
-*Customer Details:*
-👤 Name: {data.get('name', 'N/A')}
-📞 Phone: {data.get('phone', 'N/A')}
-🏠 Address: {data.get('address', 'N/A')}
-📧 Email: {data.get('email', 'Not provided')}
-
-*Order Details:*
-👗 Garment Type: {data.get('garment_type', 'N/A')}
-✂️ Style/Design: {data.get('style', 'Not specified')}
-📏 Measurements:
-"""
+        values = {
+            'now': datetime.now().strftime("%d/%m/%Y, %I:%M:%S %p"),
+            'name': get('name', 'N/A'),
+            'phone': get('phone', 'N/A'),
+            'address': get('address', 'N/A'),
+            'email': get('email', 'Not provided'),
+            'garment_type': get('garment_type', 'N/A'),
+            'style': get('style', 'Not specified'),
+            'measurements': measurements,
+            'instructions': get('instructions', 'None'),
+            'delivery_date': get('delivery_date', 'Not specified')
+        }
         
-        # Add measurements if provided
-        measurements = [
-            ('Bust', data.get('bust')),
-            ('Waist', data.get('waist')),
-            ('Hip', data.get('hip')),
-            ('Shoulder', data.get('shoulder')),
-            ('Arm Length', data.get('arm_length')),
-            ('Garment Length', data.get('garment_length')),
-            ('Sleeve Length', data.get('sleeve_length')),
-            ('Neck Depth', data.get('neck_depth')),
-        ]
-        
-        for label, value in measurements:
-            if value:
-                message += f"   • {label}: {value} inches\n"
-        
-        if not any(v for _, v in measurements):
-            message += "   • No measurements provided\n"
-        
-        # Additional information
-        message += f"""
-*Additional Info:*
-📝 Special Instructions: {data.get('instructions', 'None')}
-📅 Preferred Delivery: {data.get('delivery_date', 'Not specified')}
-
-Thank you for choosing Rudransh Tailoring! 🙏
-Please confirm my booking."""
+        message_parts, encoded_parts = [], []
+        for literal, encoded_literal, field in _TEMPLATE_PARTS:
+            value = str(values[field]) if field else ''
+            message_parts += (literal, value)
+            if encode:
+                encoded_parts += (encoded_literal, quote_message(value))
         
-        return message
+        return ''.join(message_parts), ''.join(encoded_parts)
+    
+    def format_whatsapp_message(self, data: Dict[str, Any]) -> str:
+        """
+        Format form data into a WhatsApp message
+        """
+        return self._render(data, encode=False)[0]
     
     def generate_whatsapp_url(self, data: Dict[str, Any]) -> str:
         """
         Generate WhatsApp URL with pre-filled message
         """
-        message = self.format_whatsapp_message(data)
-        encoded_message = urllib.parse.quote(message)
-        return f"https://wa.me/{self.whatsapp_number}?text={encoded_message}"
+        return self.url_prefix + self._render(data)[1]
     
     def process_booking(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -115,9 +193,9 @@ Please confirm my booking."""
             'message': str (formatted message)
         }
         """
-        # Validate form
-        is_valid, error = self.validate_form(data)
-        if not is_valid:
+        # Validate form (also yields the cleaned phone number)
+        error, phone_digits = self._check(data)
+        if error:
             return {
                 'success': False,
                 'error': error,
@@ -125,51 +203,147 @@ Please confirm my booking."""
                 'message': None
             }
         
-        # Clean phone number
-        phone = str(data['phone']).strip()
-        phone_digits = ''.join(filter(str.isdigit, phone))
-        if len(phone_digits) == 12 and phone_digits.startswith('91'):
-            phone_digits = phone_digits[2:]
         data['phone'] = phone_digits
         
-        # Generate WhatsApp URL and message
-        whatsapp_url = self.generate_whatsapp_url(data)
-        message = self.format_whatsapp_message(data)
+        # Build the message and its encoded form once
+        message, encoded_message = self._render(data)
         
         return {
             'success': True,
             'error': None,
-            'whatsapp_url': whatsapp_url,
+            'whatsapp_url': self.url_prefix + encoded_message,
             'message': message
         }
     
-    def save_booking_to_json(self, data: Dict[str, Any], filename: str = "bookings.json") -> bool:
+    @staticmethod
+    def fingerprint(data: Dict[str, Any]) -> str:
+        """
+        Hash of the normalized phone number and order fields; the same for
+        repeats of one order however the phone or spacing was typed
         """
-        Save booking data to a JSON file for record keeping
+        parts = [phone_key(data.get('phone'))]
+        parts += [' '.join(str(data.get(field) or '').split()).casefold() for field in ORDER_FIELDS]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+    
+    def process_batch(self, rows: Iterable[Any]) -> Dict[str, Any]:
+        """
+        Validate and store many bookings; valid rows are saved together
+        in one storage write
+        Returns: {
+            'saved': int,
+            'failed': int,
+            'results': [{'row', 'success', 'whatsapp_url' or 'error'}, ...]
+        }
+        """
+        results = []
+        valid = []
+        submitted_at = datetime.now().isoformat()
+        
+        for row_number, data in enumerate(rows):
+            if not isinstance(data, dict):
+                error = data.error if isinstance(data, BatchRowError) else "Row must be a JSON object"
+                results.append({'row': row_number, 'success': False, 'error': error})
+                continue
+            
+            result = self.process_booking(data)
+            if result['success']:
+                data['submitted_at'] = submitted_at
+                data['status'] = 'pending'
+                valid.append(data)
+                results.append({'row': row_number, 'success': True,
+                                'whatsapp_url': result['whatsapp_url']})
+            else:
+                results.append({'row': row_number, 'success': False, 'error': result['error']})
+        
+        self.bookings.append_many(valid)
+        
+        return {'saved': len(valid), 'failed': len(results) - len(valid), 'results': results}
+    
+    @timed('booking_save')
+    def save_booking_to_json(self, data: Dict[str, Any]) -> bool:
+        """
+        Append booking data to the booking store for record keeping
         """
         try:
             # Add timestamp
             data['submitted_at'] = datetime.now().isoformat()
             data['status'] = 'pending'
             
-            # Load existing bookings
-            try:
-                with open(filename, 'r', encoding='utf-8') as f:
-                    bookings = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                bookings = []
-            
-            # Add new booking
-            bookings.append(data)
-            
-            # Save back to file
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(bookings, f, indent=2, ensure_ascii=False)
+            self.bookings.append(data)
             
             return True
         except Exception as e:
             print(f"Error saving booking: {e}")
             return False
+    
+    def list_bookings(self, filters: Dict[str, Any], limit: int = 20,
+                      cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get one page of stored bookings (newest first) using keyset pagination
+        filters: phone, status, garment_type, date_from, date_to (all optional;
+                 dates are ISO dates or datetimes, both ends inclusive)
+        Returns: {'bookings': [...], 'next_cursor': str or None}
+        Raises: ValueError for a malformed filter or cursor
+        """
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        before = self.decode_cursor(cursor) if cursor else None
+        filters = self.normalize_filters(filters)
+        
+        # Fetch one extra row to know whether another page exists
+        bookings = self.bookings.query(filters, limit + 1, before)
+        next_cursor = self.encode_cursor(bookings[limit - 1]) if len(bookings) > limit else None
+        
+        return {'bookings': bookings[:limit], 'next_cursor': next_cursor}
+    
+    def get_analytics(self, days: int = 30, months: int = 12) -> Dict[str, Any]:
+        """
+        Booking counts for the last `days` days and `months` months (by
+        garment type and status) plus the open delivery backlog, read from
+        the store's rollups instead of scanning the bookings
+        """
+        today = date.today()
+        since_day = (today - timedelta(days=max(days, 1) - 1)).isoformat()
+        month_index = today.year * 12 + today.month - max(months, 1)
+        since_month = f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+        return summarize(self.bookings.rollups(), since_day, since_month, today.isoformat())
+    
+    @staticmethod
+    def normalize_filters(filters: Dict[str, Any]) -> Dict[str, str]:
+        """Drop empty filters and bring the rest into the form the indexes use"""
+        normalized = {}
+        for field in ('phone', 'status', 'garment_type', 'date_from', 'date_to'):
+            value = str(filters.get(field) or '').strip()
+            if not value:
+                continue
+            if field == 'phone':
+                value = phone_key(value)
+                if len(value) < 10:
+                    raise ValueError("Phone filter must have at least 10 digits")
+            elif field in ('status', 'garment_type'):
+                value = value.lower()
+            else:
+                try:
+                    datetime.fromisoformat(value)
+                except ValueError:
+                    raise ValueError(f"Invalid {field}: use YYYY-MM-DD or an ISO datetime")
+            normalized[field] = value
+        return normalized
+    
+    @staticmethod
+    def encode_cursor(booking: Dict[str, Any]) -> str:
+        """Opaque pagination cursor for the position after `booking`"""
+        key = json.dumps([booking['id']])
+        return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> int:
+        """Decode a cursor back into its booking id"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            booking_id, = json.loads(base64.urlsafe_b64decode(padded))
+            return int(booking_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
 
 
 # For direct testing
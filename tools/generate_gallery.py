@@ -5,10 +5,18 @@ Automatically generates gallery HTML from images in the images/ folder
 """
 
 import os
+import re
 import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+from image_probe import probe_image
+from dir_watcher import DirectoryWatcher
+
 # Category mapping based on filename keywords
 CATEGORY_KEYWORDS = {
     'blouse': ['blouse', 'blouses', 'choli'],
@@ -38,6 +46,19 @@ CATEGORY_ICONS = {
     'other': '👘'
 }
 
+VALID_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.JPG', '.JPEG', '.PNG'}
+
+# Remembers what the last run saw, for incremental builds
+STATE_FILE = '.gallery-state.json'
+STATE_VERSION = 2
+
+# Below this many files, hashing/probing runs in-process (pool startup costs more)
+PARALLEL_THRESHOLD = 16
+
+# Markers around the generated tiles inside the adminGallery div
+GALLERY_START = '<!-- gallery:start -->'
+GALLERY_END = '<!-- gallery:end -->'
+
 
 def detect_category(filename):
     """Detect category based on filename keywords"""
@@ -59,63 +80,196 @@ def format_title(filename):
 
 
 def scan_images_folder(images_path='../images'):
-    """Scan images folder and return list of image data"""
+    """
+    Scan images folder and return list of image data
+    (including dimensions, byte size, orientation and dominant colour)
+    """
+    images, _, _ = scan_images_incremental(images_path)
+    return images
+
+
+def is_gallery_image(filename):
+    """Image files the gallery picks up (README and other files are skipped)"""
+    return Path(filename).suffix in VALID_EXTENSIONS and not filename.startswith('README')
+
+
+def build_image_entry(filename, info=None):
+    """Gallery data for one image file, plus probed metadata if given"""
+    category = detect_category(filename)
+    return {
+        'filename': filename,
+        'path': f'images/{filename}',
+        'category': category,
+        'title': format_title(filename),
+        'description': f'Beautiful custom {CATEGORY_NAMES.get(category, "garment")} by Rudransh Tailoring',
+        **(info or {})
+    }
+
+
+def gallery_sort_key(img):
+    """Gallery order: category, then filename"""
+    return (img['category'], img['filename'])
+
+
+def hash_file(path):
+    """Content hash of a file, read in chunks"""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def load_state(images_path='../images'):
+    """Load the previous run's state (empty if missing or outdated)"""
+    state_path = Path(images_path) / STATE_FILE
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') == STATE_VERSION:
+            return state
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {'version': STATE_VERSION, 'files': {}, 'probes': {}}
+
+
+def parallel_map(func, items):
+    """map() across a process pool for large batches, in-process otherwise"""
+    items = list(items)
+    if len(items) < PARALLEL_THRESHOLD:
+        return [func(item) for item in items]
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items, chunksize=max(1, len(items) // (workers * 4))))
+
+
+def safe_probe(path):
+    """probe_image() that reports unreadable files instead of raising"""
+    try:
+        return probe_image(path)
+    except Exception as e:
+        print(f"⚠️  Could not read {path}: {e}")
+        return {'bytes': os.path.getsize(path)}
+
+
+def save_state(state, images_path='../images'):
+    """Persist state for the next incremental run"""
+    state_path = Path(images_path) / STATE_FILE
+    tmp_path = state_path.with_name(state_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, state_path)
+
+
+def scan_images_incremental(images_path='../images', state=None):
+    """
+    Scan images folder, reusing entries and rendered tiles from `state`.
+    Only files whose size/mtime changed are hashed, and only content not
+    seen before (by hash) is probed. Hashing and probing of large batches
+    run on a process pool.
+    Returns: (images, new_state, changes) where changes counts
+             added/changed/removed files
+    """
     images_path = Path(images_path)
+    state = state or {'version': STATE_VERSION, 'files': {}, 'probes': {}}
+    previous = state.get('files', {})
+    probes = dict(state.get('probes', {}))
+    files = {}
+    changes = {'added': 0, 'changed': 0, 'removed': 0}
     
     if not images_path.exists():
         print(f"❌ Images folder not found: {images_path}")
-        return []
+        return [], state, changes
     
-    valid_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.JPG', '.JPEG', '.PNG'}
-    images = []
-    
-    for file in images_path.iterdir():
-        if file.is_file() and file.suffix in valid_extensions:
-            # Skip README and other non-image files
-            if file.name.startswith('README'):
+    # Pass 1: stat only; unchanged files keep their entry
+    stale = []
+    with os.scandir(images_path) as entries:
+        for entry in entries:
+            if not is_gallery_image(entry.name) or not entry.is_file():
                 continue
-                
-            category = detect_category(file.name)
-            title = format_title(file.name)
             
-            images.append({
-                'filename': file.name,
-                'path': f'images/{file.name}',
-                'category': category,
-                'title': title,
-                'description': f'Beautiful custom {CATEGORY_NAMES.get(category, "garment")} by Rudransh Tailoring'
-            })
-    
-    # Sort by category then filename
-    images.sort(key=lambda x: (x['category'], x['filename']))
-    return images
+            st = entry.stat()
+            prev = previous.get(entry.name)
+            
+            if prev and prev['size'] == st.st_size and prev['mtime_ns'] == st.st_mtime_ns:
+                files[entry.name] = prev
+            else:
+                stale.append((entry.name, entry.path, st))
+    
+    # Pass 2: hash what changed on disk
+    hashes = parallel_map(hash_file, [path for _, path, _ in stale])
+    
+    # Pass 3: probe content the cache has not seen
+    unseen = {file_hash: path for (_, path, _), file_hash in zip(stale, hashes)
+              if file_hash not in probes}
+    probes.update(zip(unseen.keys(), parallel_map(safe_probe, unseen.values())))
+    
+    for (name, path, st), file_hash in zip(stale, hashes):
+        prev = previous.get(name)
+        if prev and prev['hash'] == file_hash:
+            # Touched but not modified: keep the rendered tile
+            files[name] = {**prev, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            continue
+        
+        image = build_image_entry(name, probes[file_hash])
+        files[name] = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'hash': file_hash,
+            'image': image,
+            'tile': render_tile(image)
+        }
+        changes['changed' if prev else 'added'] += 1
+    
+    changes['removed'] = len(previous.keys() - files.keys())
+    
+    # Keep only probe results still referenced by a file
+    live = {entry['hash'] for entry in files.values()}
+    new_state = {
+        'version': STATE_VERSION,
+        'files': files,
+        'probes': {h: info for h, info in probes.items() if h in live}
+    }
+    
+    images = sorted((f['image'] for f in files.values()), key=gallery_sort_key)
+    return images, new_state, changes
 
 
-def generate_gallery_html(images):
-    """Generate gallery HTML from images list"""
-    if not images:
-        return "<!-- No images found in images/ folder -->"
+def render_tile(img):
+    """Render the HTML tile for one image"""
+    # Intrinsic size lets the browser reserve space before the image loads
+    size_attrs = ''
+    if img.get('width') and img.get('height'):
+        size_attrs = f' width="{img["width"]}" height="{img["height"]}"'
+    if img.get('dominant_color'):
+        size_attrs += f' style="background-color: {img["dominant_color"]};"'
     
-    html_parts = []
-    
-    for img in images:
-        icon = CATEGORY_ICONS.get(img['category'], '👘')
-        html_parts.append(f'''                <!-- {img['title']} -->
+    return f'''                <!-- {img['title']} -->
                 <div class="gallery-item" data-category="{img['category']}" onclick="openFileModal('{img['path']}', '{img['category']}', '{img['title']}', '{img['description']}')">
                     <div class="gallery-image-wrapper">
-                        <img src="{img['path']}" alt="{img['title']}" loading="lazy">
+                        <img src="{img['path']}" alt="{img['title']}" loading="lazy"{size_attrs}>
                     </div>
                     <div class="gallery-info">
                         <h4>{img['title']}</h4>
                         <p>{img['description']}</p>
                         <p style="color: var(--primary); font-size: 0.85rem; margin-top: 8px;">👆 Click to view & order</p>
                     </div>
-                </div>''')
+                </div>'''
+
+
+def generate_gallery_html(images, tiles=None):
+    """
+    Generate gallery HTML from images list
+    `tiles` maps filename -> pre-rendered tile (incremental builds)
+    """
+    if not images:
+        return "<!-- No images found in images/ folder -->"
     
-    return '\n'.join(html_parts)
+    tiles = tiles or {}
+    return '\n'.join(tiles.get(img['filename']) or render_tile(img) for img in images)
 
 
-def update_gallery_html(images, gallery_path='../gallery.html'):
+def update_gallery_html(images, gallery_path='../gallery.html', tiles=None):
     """Update gallery.html with generated HTML"""
     gallery_path = Path(gallery_path)
     
@@ -128,23 +282,26 @@ def update_gallery_html(images, gallery_path='../gallery.html'):
         content = f.read()
     
     # Generate new gallery HTML
-    gallery_html = generate_gallery_html(images)
-    
-    # Find the adminGallery div and replace its content
-    import re
+    gallery_html = generate_gallery_html(images, tiles)
     
-    # Pattern to match the adminGallery div content
-    pattern = r'(<div class="gallery-grid" id="adminGallery">)(.*?)(</div>)'
-    
-    replacement = f'''\1
+    generated = f'''{GALLERY_START}
                     <!-- Auto-generated gallery - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")} -->
                     <p style="color: #666; text-align: center; grid-column: 1/-1; padding: 10px; font-size: 0.9rem;">
                         🖼️ Showing {len(images)} design(s)
                     </p>
 {gallery_html}
-                \3'''
+                {GALLERY_END}'''
     
-    new_content = re.sub(pattern, replacement, content, flags=re.DOTALL)
+    if GALLERY_START in content and GALLERY_END in content:
+        # Replace between the markers left by a previous run
+        start = content.index(GALLERY_START)
+        end = content.index(GALLERY_END) + len(GALLERY_END)
+        new_content = content[:start] + generated + content[end:]
+    else:
+        # First run: replace the placeholder content of the adminGallery div
+        pattern = r'(<div class="gallery-grid" id="adminGallery">)(.*?)(</div>)'
+        new_content = re.sub(pattern, lambda m: f"{m.group(1)}\n                {generated}\n            {m.group(3)}",
+                             content, count=1, flags=re.DOTALL)
     
     # Write back
     with open(gallery_path, 'w', encoding='utf-8') as f:
@@ -186,34 +343,84 @@ def print_stats(images):
         print(f"  {icon} {CATEGORY_NAMES.get(cat, cat)}: {count}")
 
 
-def main():
-    """Main function"""
-    print("=" * 50)
-    print("🖼️  Rudransh Tailoring - Gallery Generator")
-    print("=" * 50)
+def build_gallery(images_path='../images', gallery_path='../gallery.html', full=False):
+    """
+    Incrementally rebuild manifest and gallery.html
+    Returns: True if anything was written
+    """
+    state = None if full else load_state(images_path)
+    images, new_state, changes = scan_images_incremental(images_path, state)
     
-    # Scan images folder
-    print("\n🔍 Scanning images/ folder...")
-    images = scan_images_folder()
-    
-    # Print stats
     print_stats(images)
     
-    if not images:
+    manifest_path = Path(images_path) / 'gallery-manifest.json'
+    if state and not any(changes.values()) and manifest_path.exists():
+        print("\n✨ No changes since last run - nothing to write")
+        return False
+    
+    print(f"\n🔁 Added: {changes['added']}, changed: {changes['changed']}, removed: {changes['removed']}")
+    
+    if not images and not changes['removed']:
         print("\n⚠️  No images found. Add images to the 'images/' folder first.")
-        return
+        save_state(new_state, images_path)
+        return False
     
     # Generate JSON manifest
     print("\n📝 Generating manifest...")
-    generate_json_manifest(images)
+    generate_json_manifest(images, manifest_path)
     
-    # Update gallery.html
+    # Update gallery.html with cached tiles; only changed files were re-rendered
     print("\n🔄 Updating gallery.html...")
-    if update_gallery_html(images):
+    tiles = {name: entry['tile'] for name, entry in new_state['files'].items()}
+    if update_gallery_html(images, gallery_path, tiles):
         print("✅ Gallery updated successfully!")
     else:
         print("❌ Failed to update gallery.html")
     
+    save_state(new_state, images_path)
+    return True
+
+
+def watch(images_path='../images', gallery_path='../gallery.html', debounce=0.25):
+    """Rebuild incrementally whenever images are added, changed or removed"""
+    watcher = DirectoryWatcher(images_path, match=is_gallery_image, debounce=debounce)
+    print(f"\n👀 Watching {images_path} ({watcher.mode}). Press Ctrl+C to stop.")
+    
+    try:
+        while True:
+            changed = watcher.wait()
+            started = time.perf_counter()
+            print(f"\n📂 {len(changed)} file(s) changed: {', '.join(sorted(changed)[:5])}")
+            build_gallery(images_path, gallery_path)
+            print(f"⏱️  Rebuilt in {(time.perf_counter() - started) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        watcher.close()
+
+
+def main(argv=None):
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Generate gallery.html from the images/ folder')
+    parser.add_argument('--full', action='store_true', help='Ignore saved state and rebuild everything')
+    parser.add_argument('--watch', action='store_true', help='Keep running and rebuild when images change')
+    parser.add_argument('--debounce', type=float, default=0.25, help='Seconds of quiet before rebuilding (watch mode)')
+    args = parser.parse_args(argv)
+    
+    print("=" * 50)
+    print("🖼️  Rudransh Tailoring - Gallery Generator")
+    print("=" * 50)
+    
+    if args.watch:
+        build_gallery(full=args.full)
+        watch(debounce=args.debounce)
+        return
+    
+    # Scan images folder
+    print("\n🔍 Scanning images/ folder...")
+    if not build_gallery(full=args.full):
+        return
+    
     print("\n" + "=" * 50)
     print("Next steps:")
     print("  1. Review the changes in gallery.html")
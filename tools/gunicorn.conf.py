@@ -0,0 +1,89 @@
+"""
+Gunicorn Configuration for Rudransh Tailoring
+Run from the tools/ folder: gunicorn -c gunicorn.conf.py wsgi:application
+
+Every setting can be overridden with the environment variable shown.
+"""
+
+import os
+import glob
+import tempfile
+import multiprocessing
+
+# ---------- Socket ----------
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+backlog = 2048
+
+# ---------- Workers ----------
+
+# Threaded workers: requests mostly wait on disk (uploads, metadata, the
+# booking journal), so a few processes with several threads each serve
+# more requests than many single-threaded processes, at lower memory.
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Import app.py (managers, caches, database schema) once in the master
+# and fork workers from it. Per-process resources (booking writer thread,
+# SQLite connections, variant thread pool) are created lazily after fork.
+preload_app = True
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+# ---------- Timeouts ----------
+
+# A worker that does not report in for `timeout` seconds is killed and
+# replaced (covers a request stuck on a slow upload or disk)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+# Keep idle client connections open for a few seconds so browsers and a
+# reverse proxy can reuse them for the next request
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Worker heartbeat file in memory rather than on a possibly slow disk
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# ---------- Request limits ----------
+
+limit_request_line = 8190
+limit_request_fields = 100
+
+# ---------- Metrics ----------
+
+# Each worker writes its counters to METRICS_DIR so /api/metrics reports
+# totals for the whole server, whichever worker answers the scrape
+METRICS_DIR = os.environ.setdefault(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), f"rudransh-metrics-{os.getpid()}"))
+
+# ---------- Logging ----------
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def _clear_metrics():
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json*')):
+        os.unlink(path)
+
+
+def on_starting(server):
+    """Start every server run with fresh metrics"""
+    _clear_metrics()
+
+
+def on_exit(server):
+    _clear_metrics()
+
+
+def worker_exit(server, worker):
+    """Write out queued bookings and finish thumbnails before a worker exits"""
+    import app
+    import metrics
+    app.form_processor.bookings.close()
+    app.image_manager.variants.shutdown()
+    metrics.REGISTRY.retire()
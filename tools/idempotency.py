@@ -0,0 +1,237 @@
+"""
+Idempotency for Rudransh Tailoring
+Repeated booking submissions (double taps, client retries) get the first
+response again instead of being processed and stored a second time
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from file_lock import file_lock, atomic_write_json
+
+# Longest Idempotency-Key header accepted
+MAX_KEY_LENGTH = 255
+
+# Seconds a claimed key may stay unanswered before another request may
+# take it over (covers a worker killed mid-request)
+CLAIM_TIMEOUT = 30.0
+
+# (request fingerprint, response status or None while pending, response body, expires_at)
+Entry = Tuple[str, Optional[int], Optional[Dict[str, Any]], float]
+
+
+class IdempotencyError(Exception):
+    """A repeated request that cannot be answered from the cache"""
+    status = 400
+
+
+class RequestInProgress(IdempotencyError):
+    """The first request with this key is still being processed"""
+    status = 409
+
+
+class KeyReused(IdempotencyError):
+    """The key was already used for a different booking"""
+    status = 422
+
+
+def replay_key(kind: str, value: str) -> str:
+    """Storage key for an Idempotency-Key header ('key') or a booking fingerprint ('booking')"""
+    return hashlib.sha256(f"{kind}\0{value}".encode('utf-8')).hexdigest()
+
+
+class ReplayFiles:
+    """
+    Shared replay entries for the JSON backend: one small JSON file per key
+    in `folder`, whose modification time is set to the entry's expiry.
+
+    Claims, answers and releases hold `<folder>/claims.lock`, so exactly
+    one request per key (in any worker) gets to process it. Readers see
+    whole files only (atomic replacement).
+    """
+
+    def __init__(self, folder: str):
+        self.folder = Path(folder)
+        self._lock_path = self.folder / 'claims'
+
+    def _path(self, key: str) -> Path:
+        return self.folder / f"{key}.json"
+
+    def _read(self, key: str, now: float) -> Optional[Entry]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at = os.fstat(f.fileno()).st_mtime
+                if expires_at <= now:
+                    return None
+                data = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        return data['fingerprint'], data['status'], data['body'], expires_at
+
+    def _write(self, key: str, fingerprint: str, status: Optional[int],
+               body: Optional[Dict[str, Any]], expires_at: float):
+        path = self._path(key)
+        atomic_write_json(path, {'fingerprint': fingerprint, 'status': status, 'body': body},
+                          fsync=False, ensure_ascii=False)
+        os.utime(path, (expires_at, expires_at))
+
+    def claim(self, key: str, fingerprint: str, now: float) -> Optional[Entry]:
+        """
+        Take the key for this request unless a live entry exists
+        Returns: None if claimed, else the existing entry
+        """
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with file_lock(self._lock_path):
+            entry = self._read(key, now)
+            if entry is None:
+                self._write(key, fingerprint, None, None, now + CLAIM_TIMEOUT)
+            return entry
+
+    def complete(self, key: str, fingerprint: str, status: int,
+                 body: Dict[str, Any], expires_at: float):
+        """Store the response to replay until `expires_at`"""
+        with file_lock(self._lock_path):
+            self._write(key, fingerprint, status, body, expires_at)
+
+    def release(self, key: str):
+        """Drop a claim whose request was not answered (it may be retried)"""
+        with file_lock(self._lock_path):
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def sweep(self, now: float) -> int:
+        """Delete expired entries; returns how many"""
+        removed = 0
+        if not self.folder.is_dir():
+            return 0
+        # Under the claims lock: a file just written has its expiry set only
+        # after it is in place, and must not be mistaken for an expired one
+        with file_lock(self._lock_path):
+            for entry in os.scandir(self.folder):
+                # Only finished files; temp files of a write in progress end in .tmp
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    if entry.stat().st_mtime <= now:
+                        os.unlink(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class IdempotencyCache:
+    """
+    Answers repeated booking submissions with the response of the first.
+
+    A request is identified by its Idempotency-Key header when it has
+    one (kept `key_ttl` seconds), otherwise by a fingerprint of the
+    booking itself (kept `duplicate_ttl` seconds; 0 turns this off).
+
+    Answers live in a shared store (ReplayFiles or SqliteReplayStore), so
+    a repeat reaching another worker is recognised too, with a bounded
+    in-memory copy of recent answers in front of it. A repeat arriving
+    while the first request is still running waits up to `wait` seconds
+    for its answer. Only successful (2xx) answers are kept; after an
+    error the request can simply be retried.
+    """
+
+    def __init__(self, store, key_ttl: float = 24 * 60 * 60, duplicate_ttl: float = 10 * 60,
+                 max_entries: int = 10000, wait: float = 10.0, sweep_interval: float = 60.0):
+        self.store = store
+        self.key_ttl = key_ttl
+        self.duplicate_ttl = duplicate_ttl
+        self.max_entries = max_entries
+        self.wait = wait
+        self.sweep_interval = sweep_interval
+
+        self._local: 'OrderedDict[str, Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def run(self, key: Optional[str], fingerprint: str,
+            handler: Callable[[], Tuple[Dict[str, Any], int]]) -> Tuple[Dict[str, Any], int, bool]:
+        """
+        Call `handler()` -> (body, status) once per key or fingerprint
+        Returns: (body, status, replayed)
+        Raises: RequestInProgress if the first request is still running
+                after `wait` seconds, KeyReused if `key` came with a
+                different booking
+        """
+        if key:
+            replay, ttl = replay_key('key', key), self.key_ttl
+        else:
+            replay, ttl = replay_key('booking', fingerprint), self.duplicate_ttl
+        if ttl <= 0:
+            return (*handler(), False)
+
+        now = time.time()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        entry = self._recall(replay, now) or self._claim(replay, fingerprint, now)
+        if entry is not None:
+            if entry[0] != fingerprint:
+                raise KeyReused("Idempotency-Key was already used for a different booking")
+            return entry[2], entry[1], True
+
+        try:
+            body, status = handler()
+        except BaseException:
+            self.store.release(replay)
+            raise
+        if 200 <= status < 300:
+            expires_at = time.time() + ttl
+            self.store.complete(replay, fingerprint, status, body, expires_at)
+            self._remember(replay, (fingerprint, status, body, expires_at))
+        else:
+            self.store.release(replay)
+        return body, status, False
+
+    def _claim(self, replay: str, fingerprint: str, now: float) -> Optional[Entry]:
+        """Claim the key (None), or wait for the answer of the request holding it"""
+        deadline = now + self.wait
+        delay = 0.01
+        while True:
+            entry = self.store.claim(replay, fingerprint, now)
+            if entry is None or entry[0] != fingerprint:
+                return entry
+            if entry[1] is not None:
+                self._remember(replay, entry)
+                return entry
+            if time.time() + delay > deadline:
+                raise RequestInProgress("This booking is still being processed, please wait")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            now = time.time()
+
+    def _recall(self, replay: str, now: float) -> Optional[Entry]:
+        with self._lock:
+            entry = self._local.get(replay)
+            if entry is not None and entry[3] <= now:
+                del self._local[replay]
+                entry = None
+            return entry
+
+    def _remember(self, replay: str, entry: Entry):
+        with self._lock:
+            self._local[replay] = entry
+            self._local.move_to_end(replay)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _sweep(self, now: float):
+        """Forget expired answers, here and in the shared store"""
+        self._next_sweep = now + self.sweep_interval
+        with self._lock:
+            for replay in [r for r, entry in self._local.items() if entry[3] <= now]:
+                del self._local[replay]
+        self.store.sweep(now)
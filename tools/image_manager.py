@@ -4,19 +4,31 @@ Handles image uploads, storage, and deletion for gallery
 """
 
 import os
-import uuid
 import json
+import uuid
+import time
+import base64
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from werkzeug.utils import secure_filename
 
+from storage import JsonImageStore
+from file_lock import file_lock
+from metrics import timed
+from image_variants import VariantPipeline
+from search_index import SearchIndex
+from upload_stream import sniff_image_type, content_hash, SNIFF_BYTES, IMAGE_EXTENSIONS
+
 
 class ImageManager:
     """Manage gallery images with file system storage"""
     
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+    MAX_PAGE_SIZE = 100
+    # Temp uploads older than this belong to no running request
+    STALE_UPLOAD_AGE = 60 * 60
     
     # Category mapping with icons
     CATEGORIES = {
@@ -28,20 +40,51 @@ class ImageManager:
         'other': {'name': 'Other', 'icon': '👘'}
     }
     
-    def __init__(self, upload_folder: str = "../uploads", metadata_file: str = "image_metadata.json"):
+    def __init__(self, upload_folder: str = "../uploads", metadata_file: str = "image_metadata.json",
+                 store=None):
         self.upload_folder = Path(upload_folder)
         self.metadata_file = Path(metadata_file)
+        # Metadata backend (see storage.py); JSON file by default
+        self.store = store or JsonImageStore(metadata_file)
+        # Resized WebP/JPEG copies are built in the background (needs Pillow)
+        self.variants = VariantPipeline(self.upload_folder, on_done=self._record_variants)
+        # Word index for search; built on first search, then patched by each write
+        self.search = SearchIndex()
         self._ensure_directories()
+        self._sweep_incoming()
+    
+    @property
+    def incoming_folder(self) -> Path:
+        """Where streamed uploads are written before being moved into place"""
+        return self.upload_folder / '.incoming'
+    
+    @property
+    def blob_folder(self) -> Path:
+        """Content-addressed image files, named by their hash"""
+        return self.upload_folder / 'blobs'
     
     def _ensure_directories(self):
         """Create necessary directories if they don't exist"""
         self.upload_folder.mkdir(parents=True, exist_ok=True)
         
+        self.incoming_folder.mkdir(exist_ok=True)
+        self.blob_folder.mkdir(exist_ok=True)
+        
         # Create category subdirectories
         for category in self.CATEGORIES.keys():
             category_path = self.upload_folder / category
             category_path.mkdir(exist_ok=True)
     
+    def _sweep_incoming(self):
+        """Remove temp uploads left behind by a crashed or killed worker"""
+        cutoff = time.time() - self.STALE_UPLOAD_AGE
+        for path in self.incoming_folder.glob('*.part'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+    
     def allowed_file(self, filename: str) -> bool:
         """Check if file extension is allowed"""
         return '.' in filename and \
@@ -58,15 +101,31 @@ class ImageManager:
         if not self.allowed_file(file_storage.filename):
             return False, f"Invalid file type. Allowed: {', '.join(self.ALLOWED_EXTENSIONS)}"
         
-        # Check file size
-        file_storage.seek(0, os.SEEK_END)
-        file_size = file_storage.tell()
-        file_storage.seek(0)
+        # Streamed uploads (upload_stream.UploadFile) already know their
+        # size and type; anything else is measured here
+        stream = file_storage.stream
+        file_size = getattr(stream, 'size', None)
+        if file_size is None:
+            file_storage.seek(0, os.SEEK_END)
+            file_size = file_storage.tell()
+            file_storage.seek(0)
         
         if file_size > self.MAX_FILE_SIZE:
             max_mb = self.MAX_FILE_SIZE / (1024 * 1024)
             return False, f"File too large. Maximum size: {max_mb}MB"
         
+        # Rejected while streaming (its temp file is already gone)
+        error = getattr(stream, 'error', None)
+        if error is not None:
+            return False, error.description
+        
+        # Check content, not just the extension
+        if getattr(stream, 'kind', None) is None:
+            header = file_storage.read(SNIFF_BYTES)
+            file_storage.seek(0)
+            if sniff_image_type(header) is None:
+                return False, "File content is not a valid image"
+        
         return True, ""
     
     def save_image(self, file_storage, category: str, title: str = "", 
@@ -75,154 +134,329 @@ class ImageManager:
         Save uploaded image to filesystem
         Returns: image metadata dict or error dict
         """
-        # Validate category
-        if category not in self.CATEGORIES:
-            return {'success': False, 'error': f"Invalid category: {category}"}
-        
-        # Validate file
-        is_valid, error = self.validate_file(file_storage)
-        if not is_valid:
-            return {'success': False, 'error': error}
+        return self.save_images([(file_storage, category, title, description)])[0]
+    
+    def save_images(self, uploads: List[tuple]) -> List[Dict[str, Any]]:
+        """
+        Save several uploaded images with a single metadata write
+        uploads: (file_storage, category, title, description) tuples
+        Returns: one result dict per upload, in order
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(uploads)
+        pending = []
         
-        try:
-            # Generate unique filename
-            original_filename = secure_filename(file_storage.filename)
-            file_ext = original_filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
+        for i, (file_storage, category, title, description) in enumerate(uploads):
+            # Validate category
+            if category not in self.CATEGORIES:
+                results[i] = {'success': False, 'error': f"Invalid category: {category}"}
+                continue
             
-            # Save to category folder
-            category_path = self.upload_folder / category
-            file_path = category_path / unique_filename
-            
-            file_storage.save(file_path)
+            # Validate file
+            is_valid, error = self.validate_file(file_storage)
+            if not is_valid:
+                results[i] = {'success': False, 'error': error}
+                continue
             
-            # Create metadata
-            image_data = {
-                'id': str(uuid.uuid4().hex),
-                'title': title or original_filename,
-                'description': description,
-                'category': category,
-                'filename': unique_filename,
-                'original_filename': original_filename,
-                'file_path': str(file_path),
-                'file_size': os.path.getsize(file_path),
-                'uploaded_at': datetime.now().isoformat(),
-                'url': f"/uploads/{category}/{unique_filename}"
-            }
+            try:
+                # Name the file by its content so identical uploads share one file
+                digest, kind = self._content_key(file_storage)
+                pending.append((i, file_storage, f"{digest}.{IMAGE_EXTENSIONS[kind]}",
+                                category, title, description))
+            except Exception as e:
+                results[i] = {'success': False, 'error': f"Failed to save image: {str(e)}"}
+        
+        saved = []
+        # Held until the blob references are recorded, so a concurrent
+        # delete of the same content cannot unlink a file in between
+        with self._blob_lock():
+            for i, file_storage, unique_filename, category, title, description in pending:
+                try:
+                    image_data = self._place_file(file_storage, unique_filename,
+                                                  category, title, description)
+                    saved.append((i, image_data))
+                except Exception as e:
+                    results[i] = {'success': False, 'error': f"Failed to save image: {str(e)}"}
             
             # Save to metadata
-            self._save_metadata(image_data)
-            
-            return {'success': True, 'image': image_data}
-            
-        except Exception as e:
-            return {'success': False, 'error': f"Failed to save image: {str(e)}"}
+            try:
+                before = self.store.version()
+                self.store.add_images([image_data for _, image_data in saved])
+                self._index_write([image_data for _, image_data in saved], [], before)
+            except Exception as e:
+                for i, _ in saved:
+                    results[i] = {'success': False, 'error': f"Failed to save image: {str(e)}"}
+                saved = []
+        
+        for i, image_data in saved:
+            results[i] = {'success': True, 'image': image_data}
+            # Thumbnails are filled in later by the variant pipeline
+            self.variants.submit(image_data['id'], Path(image_data['file_path']))
+        
+        return results
+    
+    @timed('upload_write')
+    def _place_file(self, file_storage, unique_filename: str, category: str,
+                    title: str, description: str) -> Dict[str, Any]:
+        """Move an upload into the blob folder and build its metadata record"""
+        original_filename = secure_filename(file_storage.filename)
+        file_path = self.blob_folder / unique_filename
+        
+        # A duplicate upload reuses the stored copy; its temp file is dropped
+        if not file_path.exists():
+            if hasattr(file_storage.stream, 'claim'):
+                # Already on disk in the upload folder; just move it
+                file_storage.stream.claim(file_path)
+            else:
+                file_storage.save(file_path)
+        
+        # Create metadata
+        return {
+            'id': str(uuid.uuid4().hex),
+            'title': title or original_filename,
+            'description': description,
+            'category': category,
+            'filename': unique_filename,
+            'blob': unique_filename,
+            'original_filename': original_filename,
+            'file_path': str(file_path),
+            'file_size': os.path.getsize(file_path),
+            'uploaded_at': datetime.now().isoformat(),
+            'url': f"/uploads/blobs/{unique_filename}",
+            'variants': []
+        }
+    
+    def _content_key(self, file_storage) -> tuple[str, str]:
+        """
+        Content hash and detected format of an upload.
+        Streamed uploads computed both while being written.
+        """
+        stream = file_storage.stream
+        digest, kind = getattr(stream, 'digest', None), getattr(stream, 'kind', None)
+        if digest and kind:
+            return digest, kind
+        
+        hasher = content_hash()
+        file_storage.seek(0)
+        kind = sniff_image_type(file_storage.read(SNIFF_BYTES))
+        file_storage.seek(0)
+        for chunk in iter(lambda: file_storage.read(64 * 1024), b''):
+            hasher.update(chunk)
+        file_storage.seek(0)
+        return hasher.hexdigest(), kind
     
     def delete_image(self, image_id: str) -> Dict[str, Any]:
         """
         Delete image by ID
         Returns: result dict
         """
+        return self.delete_images([image_id])[0]
+    
+    def delete_images(self, image_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Delete several images with a single metadata write
+        Returns: one result dict per id, in order
+        """
         try:
-            metadata = self._load_metadata()
+            with self._blob_lock():
+                # Remove from metadata (drops one reference to each file)
+                before = self.store.version()
+                removed = self.store.remove_images(image_ids)
+                self._index_write([], [image['id'] for image in removed if image], before)
+                
+                results = []
+                for image in removed:
+                    if not image:
+                        results.append({'success': False, 'error': 'Image not found'})
+                        continue
+                    try:
+                        self._remove_files(image)
+                    except OSError as e:
+                        print(f"Error removing files of image {image['id']}: {e}")
+                    results.append({'success': True, 'message': 'Image deleted successfully'})
+                return results
             
-            # Find image
-            image = None
-            for img in metadata['images']:
-                if img['id'] == image_id:
-                    image = img
-                    break
-            
-            if not image:
-                return {'success': False, 'error': 'Image not found'}
-            
-            # Delete file
+        except Exception as e:
+            return [{'success': False, 'error': f"Failed to delete image: {str(e)}"}
+                    for _ in image_ids]
+    
+    @timed('upload_remove')
+    def _remove_files(self, image: Dict[str, Any]):
+        """Delete an image's file and variants once no other image uses the same content"""
+        blob = image.get('blob')
+        if not blob or self.store.blob_refs(blob) == 0:
             file_path = Path(image['file_path'])
             if file_path.exists():
                 file_path.unlink()
-            
-            # Remove from metadata
-            metadata['images'] = [img for img in metadata['images'] if img['id'] != image_id]
-            self._save_metadata_dict(metadata)
-            
-            return {'success': True, 'message': 'Image deleted successfully'}
-            
-        except Exception as e:
-            return {'success': False, 'error': f"Failed to delete image: {str(e)}"}
+            self.variants.remove(image.get('variants', []))
+    
+    def _record_variants(self, image_id: str, source_path: Path, variants: List[Dict[str, Any]]):
+        """Store generated variants; clean up if the image was deleted meanwhile"""
+        with self._blob_lock():
+            before = self.store.version()
+            updated = self.store.update_image(image_id, {'variants': variants})
+            if updated is None:
+                if self.store.blob_refs(source_path.name) == 0:
+                    self.variants.remove(variants)
+            else:
+                self._index_write([updated], [], before)
+    
+    def _index_write(self, added: List[Dict[str, Any]], removed: List[str], before: int):
+        """
+        Patch the search index after a write made under the blob lock.
+        If the store moved by more than this one write, or the index was
+        already behind, it is left for the next search to sync.
+        """
+        after = self.store.version()
+        if after == before + 1:
+            self.search.apply(added, removed, before, after)
+    
+    def _blob_lock(self):
+        """
+        Cross-process lock over blob files and their reference counts.
+        Always taken before the metadata store's own lock.
+        """
+        return file_lock(self.blob_folder)
     
     def get_images(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Get all images, optionally filtered by category
         """
-        metadata = self._load_metadata()
-        images = metadata.get('images', [])
-        
+        # Stores keep images sorted by upload date (newest first)
         if category and category != 'all':
-            images = [img for img in images if img['category'] == category]
+            return self.store.list_images(category)
         
-        # Sort by upload date (newest first)
-        images.sort(key=lambda x: x.get('uploaded_at', ''), reverse=True)
+        return self.store.list_images()
+    
+    def get_images_page(self, category: Optional[str] = None, limit: int = 20,
+                        cursor: Optional[str] = None,
+                        fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Get one page of images (newest first) using keyset pagination
+        Returns: {'images': [...], 'next_cursor': str or None}
+        Raises: ValueError for a malformed cursor
+        """
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        after = self.decode_cursor(cursor) if cursor else None
+        if category == 'all':
+            category = None
         
-        return images
+        # Fetch one extra row to know whether another page exists
+        images = self.store.page_images(category, limit + 1, after)
+        next_cursor = self.encode_cursor(images[limit - 1]) if len(images) > limit else None
+        images = images[:limit]
+        
+        if fields:
+            images = self.project_fields(images, fields)
+        
+        return {'images': images, 'next_cursor': next_cursor}
+    
+    @staticmethod
+    def project_fields(images: List[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+        """Keep only the requested fields of each image"""
+        return [{k: img[k] for k in fields if k in img} for img in images]
+    
+    @staticmethod
+    def encode_cursor(image: Dict[str, Any]) -> str:
+        """Opaque pagination cursor for the position after `image`"""
+        key = json.dumps([image.get('uploaded_at', ''), image.get('id', '')])
+        return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[str, str]:
+        """Decode a cursor back into its (uploaded_at, id) key"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            uploaded_at, image_id = json.loads(base64.urlsafe_b64decode(padded))
+            return str(uploaded_at), str(image_id)
+        except (ValueError, TypeError):
+            raise ValueError("Invalid cursor")
+    
+    def search_images(self, query: str, category: Optional[str] = None, limit: int = 20,
+                      fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Find images whose title, description or original file name contain
+        every word of `query` (words may be typed partially; Hindi or English)
+        Returns: {'images': [...best first], 'total': number of matches}
+        """
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        if category == 'all':
+            category = None
+        
+        self._sync_search()
+        image_ids, total = self.search.search(query, category, limit)
+        images = [img for img in map(self.store.get_image, image_ids) if img]
+        if fields:
+            images = self.project_fields(images, fields)
+        
+        return {'images': images, 'total': total}
+    
+    def _sync_search(self):
+        """Catch the search index up with writes made by other processes"""
+        version = self.store.version()
+        if version == self.search.version:
+            return
+        documents = self.store.search_documents(since=self.search.version)
+        self.search.sync(documents, version)
+        # Every added image is indexed now, so a larger index means deletions
+        if len(self.search.numbers) != self.store.summary()['total_images']:
+            self.search.sync([], version, ids=self.store.image_ids())
+    
+    def get_version(self) -> int:
+        """Metadata version counter; changes whenever the gallery changes"""
+        return self.store.version()
     
     def get_image_by_id(self, image_id: str) -> Optional[Dict[str, Any]]:
         """Get single image by ID"""
-        metadata = self._load_metadata()
-        for img in metadata.get('images', []):
-            if img['id'] == image_id:
-                return img
-        return None
+        return self.store.get_image(image_id)
     
     def get_categories(self) -> Dict[str, Dict[str, str]]:
         """Get all available categories"""
         return self.CATEGORIES
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get gallery statistics"""
-        metadata = self._load_metadata()
-        images = metadata.get('images', [])
+        """
+        Get gallery statistics
+        Served from counters the store updates on every save/delete
+        """
+        summary = self.store.summary()
         
         stats = {
-            'total_images': len(images),
-            'total_size': sum(img.get('file_size', 0) for img in images),
+            'total_images': summary['total_images'],
+            'total_size': summary['total_size'],
             'categories': {}
         }
         
+        empty = {'count': 0, 'bytes': 0}
         for category in self.CATEGORIES.keys():
-            cat_images = [img for img in images if img['category'] == category]
+            counters = summary['categories'].get(category, empty)
             stats['categories'][category] = {
-                'count': len(cat_images),
+                'count': counters['count'],
+                'size': counters['bytes'],
                 'name': self.CATEGORIES[category]['name']
             }
         
         return stats
     
-    def _load_metadata(self) -> Dict[str, Any]:
-        """Load image metadata from JSON file"""
-        try:
-            if self.metadata_file.exists():
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
-        
-        return {'images': []}
-    
-    def _save_metadata(self, image_data: Dict[str, Any]):
-        """Add image to metadata file"""
-        metadata = self._load_metadata()
-        metadata['images'].append(image_data)
-        self._save_metadata_dict(metadata)
-    
-    def _save_metadata_dict(self, metadata: Dict[str, Any]):
-        """Save metadata dict to JSON file"""
-        with open(self.metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+    def reconcile_stats(self) -> Dict[str, Any]:
+        """Rebuild the stored gallery counters from the image records"""
+        self.store.reconcile_stats()
+        return self.get_stats()
 
 
-# For direct testing
+# For direct testing / maintenance
 if __name__ == "__main__":
-    manager = ImageManager()
+    import sys
+    from storage import open_image_store
+    
+    manager = ImageManager(store=open_image_store())
+    
+    if len(sys.argv) > 1 and sys.argv[1] == 'reconcile':
+        stats = manager.reconcile_stats()
+        print(f"✅ Rebuilt gallery counters: {stats['total_images']} image(s), "
+              f"{stats['total_size'] / 1024:.2f} KB")
+        for category, counters in stats['categories'].items():
+            print(f"  {category}: {counters['count']}")
+        sys.exit(0)
     
     print("Image Manager Test")
     print("=" * 40)
@@ -239,3 +473,4 @@ if __name__ == "__main__":
     stats = manager.get_stats()
     print(f"  Total images: {stats['total_images']}")
     print(f"  Total size: {stats['total_size'] / 1024:.2f} KB")
+    print("\nRun with 'reconcile' to rebuild the gallery counters")
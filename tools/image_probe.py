@@ -0,0 +1,105 @@
+"""
+Image Probe for Rudransh Tailoring
+Reads pixel dimensions, orientation and dominant colour of image files
+"""
+
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Optional, Any, Tuple
+
+# Pillow is optional: without it only dimensions are read (from file headers)
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# JPEG start-of-frame markers (carry the image size)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_dimensions(path) -> Optional[Tuple[int, int]]:
+    """Pixel size from the file header (PNG, GIF, WebP, JPEG); None if unknown"""
+    with open(path, 'rb') as f:
+        head = f.read(32)
+
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and len(head) >= 24:
+            return struct.unpack('>II', head[16:24])
+
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10])
+
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            chunk = head[12:16]
+            if chunk == b'VP8 ':
+                w, h = struct.unpack('<HH', head[26:30])
+                return w & 0x3FFF, h & 0x3FFF
+            if chunk == b'VP8L':
+                b0, b1, b2, b3 = head[21:25]
+                return (1 + (((b1 & 0x3F) << 8) | b0),
+                        1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6)))
+            if chunk == b'VP8X':
+                return (1 + int.from_bytes(head[24:27], 'little'),
+                        1 + int.from_bytes(head[27:30], 'little'))
+            return None
+
+        if head[:2] == b'\xff\xd8':
+            # Walk the JPEG segments until a start-of-frame marker
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                    continue
+                length_bytes = f.read(2)
+                if len(length_bytes) < 2:
+                    return None
+                length = struct.unpack('>H', length_bytes)[0]
+                if marker[1] in JPEG_SOF_MARKERS:
+                    h, w = struct.unpack('>xHH', f.read(5))
+                    return w, h
+                f.seek(length - 2, os.SEEK_CUR)
+
+    return None
+
+
+def probe_image(path) -> Dict[str, Any]:
+    """
+    Describe one image file
+    Returns: {'width', 'height', 'bytes', 'orientation', 'dominant_color'}
+             (width/height as displayed, i.e. after EXIF rotation)
+    """
+    path = Path(path)
+    info = {
+        'width': None,
+        'height': None,
+        'bytes': path.stat().st_size,
+        'orientation': None,
+        'dominant_color': None
+    }
+
+    if Image is None:
+        dims = read_dimensions(path)
+        if dims:
+            info['width'], info['height'] = dims
+        return info
+
+    with Image.open(path) as img:
+        width, height = img.size
+        orientation = img.getexif().get(0x0112, 1)
+        if orientation in (5, 6, 7, 8):
+            width, height = height, width
+        info.update(width=width, height=height, orientation=orientation)
+
+        # Decode at reduced size (JPEG draft mode), then pick the most common
+        # colour of a small palette
+        img.draft('RGB', (64, 64))
+        small = img.convert('RGB')
+        small.thumbnail((64, 64))
+        palette = small.quantize(colors=5)
+        _, index = max(palette.getcolors())
+        r, g, b = palette.getpalette()[index * 3:index * 3 + 3]
+        info['dominant_color'] = f'#{r:02x}{g:02x}{b:02x}'
+
+    return info
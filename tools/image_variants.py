@@ -0,0 +1,127 @@
+"""
+Image Variants for Rudransh Tailoring
+Generates resized WebP/JPEG copies of uploads on a background worker pool
+"""
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Any
+
+# Pillow is optional: without it uploads are simply stored as-is
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+
+class VariantPipeline:
+    """
+    Create responsive variants (several widths, WebP + JPEG) of uploaded
+    images without blocking the upload request.
+
+    Work runs on a small thread pool (Pillow releases the GIL while
+    resizing and encoding). When an image is done, `on_done(image_id,
+    source_path, variants)` is called from the worker so the caller can
+    record the variant URLs and dimensions in its metadata.
+    """
+
+    WIDTHS = (320, 640, 1024)
+    FORMATS = (('webp', 'WEBP', 'webp'), ('jpeg', 'JPEG', 'jpg'))  # (name, Pillow format, extension)
+    QUALITY = 80
+
+    def __init__(self, upload_folder: Path,
+                 on_done: Optional[Callable[[str, Path, List[Dict[str, Any]]], None]] = None,
+                 widths=WIDTHS, max_workers: int = 2):
+        self.upload_folder = Path(upload_folder)
+        self.on_done = on_done
+        self.widths = tuple(sorted(widths))
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def available(self) -> bool:
+        """True when Pillow is installed"""
+        return Image is not None
+
+    def submit(self, image_id: str, source_path: Path) -> Optional[Future]:
+        """Queue variant generation for an uploaded file"""
+        if not self.available:
+            return None
+        if self._executor is None:
+            # Created lazily so pre-forking servers start threads per worker
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='variants')
+        return self._executor.submit(self._run, image_id, Path(source_path))
+
+    def _run(self, image_id: str, source_path: Path):
+        try:
+            variants = self.generate(source_path)
+        except Exception as e:
+            print(f"Error generating variants for {source_path}: {e}")
+            return
+        if self.on_done:
+            self.on_done(image_id, source_path, variants)
+
+    def generate(self, source_path: Path) -> List[Dict[str, Any]]:
+        """
+        Write resized copies next to the source file.
+        Variants already on disk (same content-addressed source) are reused.
+        Returns: list of {'width', 'height', 'format', 'url'} dicts
+        """
+        variants = []
+        with Image.open(source_path) as original:
+            # Upright dimensions without decoding (EXIF orientations 5-8 rotate 90°)
+            src_width, src_height = original.size
+            if original.getexif().get(0x0112) in (5, 6, 7, 8):
+                src_width, src_height = src_height, src_width
+            image = None
+
+            for width in self.widths:
+                # Never upscale
+                if width >= src_width:
+                    break
+                height = round(src_height * width / src_width)
+                targets = [(name, pil_format, source_path.with_name(f"{source_path.stem}-{width}w.{ext}"))
+                           for name, pil_format, ext in self.FORMATS]
+
+                if not all(target.exists() for _, _, target in targets):
+                    if image is None:
+                        image = ImageOps.exif_transpose(original)
+                        if image.mode not in ('RGB', 'RGBA'):
+                            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+                    resized = image.resize((width, height), Image.LANCZOS)
+                    for _, pil_format, target in targets:
+                        frame = resized.convert('RGB') if pil_format == 'JPEG' else resized
+                        frame.save(target, pil_format, quality=self.QUALITY, optimize=True)
+
+                for name, _, target in targets:
+                    variants.append({
+                        'width': width,
+                        'height': height,
+                        'format': name,
+                        'url': self.url_for(target)
+                    })
+
+        return variants
+
+    def url_for(self, path: Path) -> str:
+        """Public URL of a file inside the upload folder"""
+        return '/uploads/' + path.relative_to(self.upload_folder).as_posix()
+
+    def path_for(self, url: str) -> Path:
+        """Filesystem path of an /uploads/... URL"""
+        return self.upload_folder / url[len('/uploads/'):]
+
+    def remove(self, variants: List[Dict[str, Any]]):
+        """Delete variant files from disk"""
+        for variant in variants:
+            path = self.path_for(variant['url'])
+            if path.exists():
+                path.unlink()
+
+    def shutdown(self, wait: bool = True):
+        """Finish queued work and stop the pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,64 @@
+"""
+JSON Provider for Rudransh Tailoring
+Compact API responses, encoded with orjson when it is installed
+"""
+
+import os
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional: without it the standard library encoder is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """
+    Standard library JSON, always compact (no indentation, even in debug
+    mode), keys left in insertion order and non-ASCII text (e.g. Hindi
+    titles) sent as UTF-8 instead of \\u escapes.
+    """
+
+    compact = True
+    sort_keys = False
+    ensure_ascii = False
+
+
+class OrjsonProvider(CompactJSONProvider):
+    """
+    Same output shape as CompactJSONProvider, serialized by orjson.
+    Types orjson does not know fall back to Flask's `default` hook.
+    """
+
+    OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs.get('indent') or kwargs.get('sort_keys'):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # Build the body as bytes directly, skipping the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default,
+                            option=self.OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def json_provider_class(encoder: str = None):
+    """
+    Provider class for JSON_ENCODER=auto|orjson|json
+    ('auto' picks orjson when it is installed)
+    """
+    encoder = (encoder or os.getenv('JSON_ENCODER', 'auto')).lower()
+    if encoder == 'json' or orjson is None:
+        return CompactJSONProvider
+    return OrjsonProvider
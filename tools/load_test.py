@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Load Test for Rudransh Tailoring
+Measures requests per second and latency of the gallery and booking routes
+against a running server (e.g. gunicorn -c gunicorn.conf.py wsgi:application)
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+from typing import Dict, List, Tuple
+
+from bench_booking import SAMPLE_BOOKING
+
+# name -> (method, path, JSON body)
+SCENARIOS = {
+    'gallery': ('GET', '/api/gallery/images?limit=20', None),
+    'gallery-cached': ('GET', '/api/gallery/images?limit=20', None),
+    'stats': ('GET', '/api/gallery/stats', None),
+    'validate': ('POST', '/api/booking/validate', SAMPLE_BOOKING),
+    'booking': ('POST', '/api/booking/submit', SAMPLE_BOOKING),
+}
+DEFAULT_SCENARIOS = ['gallery', 'gallery-cached', 'validate', 'booking']
+
+
+def run_client(host: str, port: int, method: str, path: str, body, conditional: bool,
+               deadline: float, latencies: List[float], errors: List[int], dropped: List[int]):
+    """
+    One keep-alive connection issuing requests back to back until the deadline.
+    A connection closed by the server (e.g. a worker being recycled) is
+    reopened and counted in `dropped`, not as an error.
+    """
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {'Content-Type': 'application/json'} if payload else {}
+    etag = None
+
+    while time.perf_counter() < deadline:
+        if conditional and etag:
+            headers['If-None-Match'] = etag
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            dropped.append(1)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+        if response.status >= 400:
+            errors.append(response.status)
+        if conditional:
+            etag = response.getheader('ETag') or etag
+    conn.close()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run_scenario(url: str, name: str, concurrency: int, duration: float) -> Tuple[int, Dict[str, float]]:
+    """Run one scenario; returns (error count, stats)"""
+    method, path, body = SCENARIOS[name]
+    parts = urlsplit(url)
+    latencies: List[float] = []
+    errors: List[int] = []
+    dropped: List[int] = []
+
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=run_client,
+                                args=(parts.hostname, parts.port or 80, method, path, body,
+                                      name.endswith('-cached'), deadline, latencies, errors, dropped))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return len(errors), {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p95': percentile(latencies, 95) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'dropped': len(dropped),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the gallery and booking API')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Server base URL')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='Parallel keep-alive connections')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='Seconds per scenario')
+    parser.add_argument('-s', '--scenario', action='append', choices=sorted(SCENARIOS),
+                        help=f"Scenario to run (repeatable; default: {' '.join(DEFAULT_SCENARIOS)})")
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for name in args.scenario or DEFAULT_SCENARIOS:
+        errors, stats = run_scenario(args.url, name, args.concurrency, args.duration)
+        stats['errors'] = errors
+        results[name] = stats
+        failed = failed or errors > 0 or stats['requests'] == 0
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("=" * 75)
+        print(f"📈 Rudransh Tailoring - Load Test ({args.url}, {args.concurrency} connections)")
+        print("=" * 75)
+        print(f"  {'scenario':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'dropped':>9}")
+        for name, stats in results.items():
+            print(f"  {name:<16}{stats['rps']:>10,.0f}{stats['p50']:>10.1f}"
+                  f"{stats['p95']:>10.1f}{stats['p99']:>10.1f}{stats['errors']:>8}{stats['dropped']:>9}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
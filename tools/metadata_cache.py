@@ -0,0 +1,172 @@
+"""
+Metadata Cache for Rudransh Tailoring
+Keeps image_metadata.json parsed and indexed in memory
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+from metrics import timed
+
+
+class MetadataCorruptError(Exception):
+    """The metadata file exists but could not be parsed"""
+
+
+def sort_key(image: Dict[str, Any]) -> Tuple[str, str]:
+    """Gallery ordering key (newest first when reversed)"""
+    return (image.get('uploaded_at', ''), image.get('id', ''))
+
+
+def seek(images: List[Dict[str, Any]], after: Tuple[str, str]) -> int:
+    """
+    Position of the first image strictly older than `after`
+    in a newest-first list (binary search, used for keyset pagination)
+    """
+    lo, hi = 0, len(images)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sort_key(images[mid]) < after:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def count_image(stats: Dict[str, Any], image: Dict[str, Any], sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) one image from gallery counters in place"""
+    size = image.get('file_size', 0) * sign
+    stats['total_images'] += sign
+    stats['total_size'] += size
+    category = image.get('category', 'other')
+    counters = stats['categories'].setdefault(category, {'count': 0, 'bytes': 0})
+    counters['count'] += sign
+    counters['bytes'] += size
+    if counters['count'] <= 0:
+        del stats['categories'][category]
+
+
+def compute_stats(images: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Gallery counters built from scratch (one pass over the images)"""
+    stats = {'total_images': 0, 'total_size': 0, 'categories': {}}
+    for image in images:
+        count_image(stats, image)
+    return stats
+
+
+def copy_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of gallery counters that can be modified without touching the original"""
+    return {
+        'total_images': stats['total_images'],
+        'total_size': stats['total_size'],
+        'categories': {cat: dict(counters) for cat, counters in stats['categories'].items()}
+    }
+
+
+class MetadataIndex:
+    """Immutable, pre-sorted view of one version of the metadata file"""
+
+    def __init__(self, metadata: Dict[str, Any]):
+        self.metadata = metadata
+        images = metadata.get('images', [])
+
+        # Newest first; uploads are appended in time order so this is ~O(n)
+        self.ordered: List[Dict[str, Any]] = sorted(images, key=sort_key, reverse=True)
+        self.by_id: Dict[str, Dict[str, Any]] = {img['id']: img for img in images}
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for img in self.ordered:
+            self.by_category.setdefault(img.get('category'), []).append(img)
+        # Counters kept in the file by writers; files from before they
+        # existed are counted once here
+        self.stats: Dict[str, Any] = metadata.get('stats') or compute_stats(images)
+        self.version: int = metadata.get('version', 0)
+
+
+class MetadataCache:
+    """
+    Process-level cache of a metadata JSON file.
+
+    The file is only re-parsed when its inode, mtime or size changes, so
+    reads in between are a stat() plus dictionary lookups. Writers in this
+    process hand the new metadata to `prime()` so the next read does not
+    have to parse the file they just wrote.
+    """
+
+    _instances: Dict[str, 'MetadataCache'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_file(cls, path: Path) -> 'MetadataCache':
+        """Shared cache instance for a metadata file path"""
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(Path(key))
+            return cls._instances[key]
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._index = MetadataIndex({'images': []})
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get(self) -> MetadataIndex:
+        """
+        Current index, reloading only if the file changed on disk.
+        If the file is unreadable the last good index keeps being served.
+        """
+        signature = self._stat()
+        if signature == self._signature:
+            return self._index
+
+        with self._lock:
+            signature = self._stat()
+            if signature != self._signature:
+                try:
+                    self._index = MetadataIndex(self._read())
+                    self._signature = signature
+                except MetadataCorruptError as e:
+                    print(f"Error loading metadata: {e}")
+            return self._index
+
+    def refresh(self) -> MetadataIndex:
+        """
+        Re-read the file unconditionally (writers call this while holding
+        the file lock, so they never modify a stale copy).
+        Raises: MetadataCorruptError if the file cannot be parsed
+        """
+        with self._lock:
+            signature = self._stat()
+            self._index = MetadataIndex(self._read())
+            self._signature = signature
+            return self._index
+
+    @timed('metadata_load')
+    def _read(self) -> Dict[str, Any]:
+        """
+        Parse the file; a missing file is an empty gallery.
+        Raises: MetadataCorruptError for a file that exists but is not valid JSON
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'images': []}
+        except (json.JSONDecodeError, UnicodeDecodeError, IOError) as e:
+            raise MetadataCorruptError(f"{self.path}: {e}") from e
+
+    def prime(self, metadata: Dict[str, Any]):
+        """Install metadata this process has just written to disk"""
+        with self._lock:
+            self._index = MetadataIndex(metadata)
+            self._signature = self._stat()
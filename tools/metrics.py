@@ -0,0 +1,321 @@
+"""
+Metrics for Rudransh Tailoring
+Request latency, payload sizes, error counts and hot-path timings,
+exported in Prometheus text format
+"""
+
+import os
+import glob
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Tuple, Any
+
+from file_lock import atomic_write_json, file_lock
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def samples(self, values) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, dict(zip(self.labelnames, key)), value)
+                for key, value in sorted(values.items())]
+
+
+class Histogram(Counter):
+    """Bucketed observations (plus sum and count) per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                # [count in each bucket..., count above the last bucket, sum]
+                data = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            data[slot] += 1
+            data[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes, in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def timed(self, **labels):
+        """Decorator form of `time()`"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            return {key: list(data) for key, data in self._values.items()}
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def samples(self, values) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        for key, data in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), data[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append((self.name + '_bucket', {**labels, 'le': le}, cumulative))
+            samples.append((self.name + '_sum', labels, data[-1]))
+            samples.append((self.name + '_count', labels, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    All metrics of this process.
+
+    Under a pre-forking server each worker counts its own requests. When
+    METRICS_DIR is set every process also writes its numbers to
+    `<METRICS_DIR>/<pid>.json` (at most once a second, after requests),
+    and `render()` adds up the files of all workers.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1.0):
+        self.metrics: Dict[str, Counter] = {}
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._last_flush = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric: Counter) -> Counter:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    # ---------- Sharing between worker processes ----------
+
+    def _snapshot_file(self) -> str:
+        return os.path.join(self.directory, f"{os.getpid()}.json")
+
+    def flush(self):
+        """Write this process's numbers to METRICS_DIR"""
+        with self._flush_lock:
+            if not self.directory:
+                return
+            self._last_flush = time.monotonic()
+            self._timer = None
+            data = {name: [[list(key), value] for key, value in metric.snapshot().items()]
+                    for name, metric in self.metrics.items()}
+            os.makedirs(self.directory, exist_ok=True)
+            atomic_write_json(self._snapshot_file(), data)
+
+    def maybe_flush(self):
+        """Flush if the last flush is old enough, otherwise schedule one"""
+        if not self.directory:
+            return
+        wait = self._last_flush + self.flush_interval - time.monotonic()
+        if wait <= 0:
+            self.flush()
+        elif self._timer is None:
+            with self._flush_lock:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def retire(self):
+        """
+        Fold this process's numbers into `retired.json` and drop its own
+        file (called when a worker exits, so recycled workers do not leave
+        a file each behind)
+        """
+        if not self.directory:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self.flush()
+        with file_lock(self._archive_file()):
+            totals = self._merge_files([self._archive_file(), self._snapshot_file()])
+            data = {name: [[list(key), value] for key, value in values.items()]
+                    for name, values in totals.items()}
+            atomic_write_json(self._archive_file(), data)
+            os.unlink(self._snapshot_file())
+        # Stop sharing: nothing this process counts from now on is exported
+        self.directory = None
+
+    def _archive_file(self) -> str:
+        return os.path.join(self.directory, 'retired.json')
+
+    def _merge_files(self, paths: List[str]) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        totals: Dict[str, Dict[Tuple[str, ...], Any]] = {name: {} for name in self.metrics}
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, entries in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                values = totals[name]
+                for key, value in entries:
+                    key = tuple(key)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+        return totals
+
+    def collect(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        """Values per metric: this process only, or all processes in METRICS_DIR"""
+        if not self.directory:
+            return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+        self.flush()
+        # Shared lock: never read a worker's file and the archive it is being folded into
+        with file_lock(self._archive_file(), shared=True):
+            return self._merge_files(glob.glob(os.path.join(self.directory, '*.json')))
+
+    # ---------- Prometheus text format ----------
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def render(self) -> str:
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample, labels, value in metric.samples(values):
+                if labels:
+                    label_text = ','.join(f'{k}="{self._escape(v)}"' for k, v in labels.items())
+                    sample = f"{sample}{{{label_text}}}"
+                lines.append(f"{sample} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+# ============== Metrics of this app ==============
+
+REGISTRY = Registry(os.getenv('METRICS_DIR') or None)
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'rudransh_http_request_duration_seconds', 'Time to handle a request',
+    ('method', 'route', 'status'))
+REQUEST_BYTES = REGISTRY.histogram(
+    'rudransh_http_request_size_bytes', 'Request body size',
+    ('method', 'route'), SIZE_BUCKETS)
+RESPONSE_BYTES = REGISTRY.histogram(
+    'rudransh_http_response_size_bytes', 'Response body size (after compression)',
+    ('method', 'route'), SIZE_BUCKETS)
+ERRORS = REGISTRY.counter(
+    'rudransh_http_errors_total', 'Responses with status 400 or higher, and unhandled exceptions',
+    ('method', 'route', 'status'))
+OPERATION_SECONDS = REGISTRY.histogram(
+    'rudransh_operation_duration_seconds',
+    'Time spent in storage and file operations (metadata_load, metadata_save, '
+    'booking_save, booking_write, upload_write, upload_remove)',
+    ('op',))
+REPLAYS = REGISTRY.counter(
+    'rudransh_booking_replays_total',
+    'Booking submissions answered with the response to an earlier identical one '
+    '(source: key = Idempotency-Key header, duplicate = same phone and order)',
+    ('source',))
+
+
+def timed(op: str):
+    """Decorator recording a function's duration under rudransh_operation_duration_seconds"""
+    return OPERATION_SECONDS.timed(op=op)
+
+
+def instrument_app(app, profiler=None):
+    """
+    Record latency, payload sizes and errors for every request.
+    Call before registering other after_request hooks (e.g. compression)
+    so the response size measured is the one sent.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        if profiler is not None:
+            profiler.start()
+
+    @app.after_request
+    def _record_response(response):
+        g.metrics_status = response.status_code
+        length = response.calculate_content_length()
+        if length is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            RESPONSE_BYTES.observe(length, method=request.method, route=route)
+        return response
+
+    @app.teardown_request
+    def _record_request(exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = g.pop('metrics_status', 500)
+
+        REQUEST_SECONDS.observe(duration, method=request.method, route=route, status=status)
+        if request.content_length:
+            REQUEST_BYTES.observe(request.content_length, method=request.method, route=route)
+        if status >= 400 or exc is not None:
+            ERRORS.inc(method=request.method, route=route, status=status)
+        if profiler is not None:
+            profiler.stop(duration, f"{request.method} {route}")
+        REGISTRY.maybe_flush()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+JSON → SQLite Migration for Rudransh Tailoring
+One-shot copy of image_metadata.json and the booking journal into SQLite
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from booking_journal import BookingJournal
+from storage import SqliteDatabase, SqliteImageStore, SqliteBookingStore
+
+
+def migrate_images(metadata_file: str, db_file: str) -> int:
+    """Copy gallery metadata into the images table (safe to re-run)"""
+    path = Path(metadata_file)
+    if not path.exists():
+        print(f"⚠️  No metadata file found: {path}")
+        return 0
+
+    with open(path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    images = metadata.get('images', [])
+
+    with SqliteDatabase.for_file(db_file).connect() as conn:
+        for image in images:
+            SqliteImageStore._insert(conn, image)
+        for blob, refs in metadata.get('blobs', {}).items():
+            conn.execute('INSERT OR REPLACE INTO blobs (name, refs) VALUES (?, ?)', (blob, refs))
+        SqliteImageStore._bump_version(conn)
+
+    # Counters follow whatever the images table now holds
+    SqliteImageStore(db_file).reconcile_stats()
+    return len(images)
+
+
+def migrate_bookings(bookings_file: str, db_file: str, force: bool = False) -> int:
+    """Stream journal (and legacy bookings.json) into the bookings table"""
+    conn = SqliteDatabase.for_file(db_file).connect()
+    existing = conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0]
+    if existing and not force:
+        print(f"⚠️  {existing} booking(s) already in {db_file}; use --force to append anyway")
+        return 0
+
+    count = 0
+    with conn:
+        for record in BookingJournal(bookings_file).iter_records():
+            SqliteBookingStore._insert(conn, record)
+            count += 1
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate JSON stores to SQLite')
+    parser.add_argument('--metadata', default='image_metadata.json', help='Gallery metadata JSON file')
+    parser.add_argument('--bookings', default='bookings.jsonl', help='Booking journal file')
+    parser.add_argument('--db', default='rudransh.db', help='SQLite database to create/update')
+    parser.add_argument('--force', action='store_true', help='Append bookings even if the table is not empty')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("🗄️  Rudransh Tailoring - JSON → SQLite Migration")
+    print("=" * 50)
+
+    images = migrate_images(args.metadata, args.db)
+    print(f"✅ Images migrated: {images}")
+
+    bookings = migrate_bookings(args.bookings, args.db, args.force)
+    print(f"✅ Bookings migrated: {bookings}")
+
+    print(f"\nStart the server with STORAGE_BACKEND=sqlite DATABASE_FILE={args.db}")
+
+
+if __name__ == '__main__':
+    main()
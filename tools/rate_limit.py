@@ -0,0 +1,208 @@
+"""
+Rate Limiting for Rudransh Tailoring
+Per-client request budgets for the expensive write endpoints, answered
+with 429 and Retry-After once a client has used up its budget
+"""
+
+import os
+import math
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import request, jsonify
+
+# (method, route) -> (requests, seconds): a client may send `requests` at
+# once, and gets them back evenly over `seconds`
+DEFAULT_LIMITS: Dict[Tuple[str, str], Tuple[int, float]] = {
+    ('POST', '/api/booking/submit'): (10, 60),
+    ('POST', '/api/booking/batch'): (5, 60),
+    ('POST', '/api/booking/preview'): (60, 60),
+    ('POST', '/api/gallery/upload'): (30, 60),
+    ('POST', '/api/gallery/upload/batch'): (5, 60),
+}
+
+STORES = ('sqlite', 'memory', 'off')
+
+# Shared by the workers of one machine; in RAM where /dev/shm exists
+DEFAULT_DB = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                          'rudransh-ratelimit.db')
+
+
+def parse_limits(text: str) -> Dict[Tuple[str, str], Tuple[int, float]]:
+    """
+    DEFAULT_LIMITS with overrides from a RATE_LIMITS string such as
+    'POST /api/booking/submit=20/60, POST /api/gallery/upload=0'
+    (0 = no limit for that route)
+    Raises: ValueError for a malformed entry
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        try:
+            route, budget = item.rsplit('=', 1)
+            method, rule = route.split()
+            count, _, seconds = budget.partition('/')
+            limit = (int(count), float(seconds or 1))
+        except ValueError:
+            raise ValueError(f"Invalid RATE_LIMITS entry '{item}': use 'METHOD /route=requests/seconds'")
+        key = (method.upper(), rule)
+        if limit[0] > 0:
+            limits[key] = limit
+        else:
+            limits.pop(key, None)
+    return limits
+
+
+class MemoryBuckets:
+    """Buckets of this process only (each worker then allows the full budget)"""
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, now: float, interval: float, period: float) -> float:
+        """
+        Spend one request from `key`'s bucket
+        Returns: 0 if allowed, else seconds to wait before the next request
+        """
+        with self._lock:
+            tat = max(self._tats.get(key, now), now) + interval
+            if tat - now > period:
+                return tat - now - period
+            self._tats[key] = tat
+            return 0.0
+
+    def sweep(self, now: float) -> int:
+        """Forget clients whose bucket is full again; returns how many"""
+        with self._lock:
+            idle = [key for key, tat in self._tats.items() if tat <= now]
+            for key in idle:
+                del self._tats[key]
+        return len(idle)
+
+
+class SqliteBuckets:
+    """
+    Buckets in a small SQLite file shared by all workers on the machine.
+    Nothing in it needs to survive a crash, so writes are not synced.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        self._local = threading.local()
+        # Not kept: this runs in the gunicorn master before workers fork
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_buckets_tat ON buckets (tat)')
+        finally:
+            conn.close()
+
+    def connect(self) -> sqlite3.Connection:
+        """Connection for the current thread (and process)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key: str, now: float, interval: float, period: float) -> float:
+        """
+        Spend one request from `key`'s bucket (one atomic statement)
+        Returns: 0 if allowed, else seconds to wait before the next request
+        """
+        with self.connect() as conn:
+            row = conn.execute(
+                'INSERT INTO buckets (key, tat) VALUES (:key, :now + :interval) '
+                'ON CONFLICT(key) DO UPDATE SET tat = max(tat, :now) + :interval '
+                'WHERE max(tat, :now) + :interval - :now <= :period RETURNING tat',
+                {'key': key, 'now': now, 'interval': interval, 'period': period}).fetchone()
+            if row:
+                return 0.0
+            tat, = conn.execute('SELECT tat FROM buckets WHERE key = ?', (key,)).fetchone()
+        return max(tat, now) + interval - now - period
+
+    def sweep(self, now: float) -> int:
+        """Forget clients whose bucket is full again; returns how many"""
+        with self.connect() as conn:
+            return conn.execute('DELETE FROM buckets WHERE tat <= ?', (now,)).rowcount
+
+
+def open_bucket_store(kind: str = 'sqlite', path: Optional[str] = None):
+    """Create the bucket store for RATE_LIMIT_STORE (None for 'off')"""
+    if kind not in STORES:
+        raise ValueError(f"Unknown RATE_LIMIT_STORE '{kind}'. Use one of: {', '.join(STORES)}")
+    if kind == 'off':
+        return None
+    if kind == 'memory':
+        return MemoryBuckets()
+    return SqliteBuckets(path or DEFAULT_DB)
+
+
+class RateLimiter:
+    """
+    before_request hook giving each client a token bucket per limited route.
+
+    A bucket is kept as a single timestamp, the time at which it will be
+    full again (the GCRA form of a token bucket): each request moves it
+    `seconds / requests` into the future, and a request that would move
+    it more than `seconds` ahead of now is refused with 429. Clients whose
+    bucket is full again are dropped by a sweep every `sweep_interval`
+    seconds, so memory is one number per recently active client.
+
+    Clients are told apart by IP address. Behind `trusted_proxies` reverse
+    proxies the address is taken from X-Forwarded-For instead.
+    If the shared store cannot be reached the request is let through.
+    """
+
+    def __init__(self, app=None, store=None, limits: Optional[Dict[Tuple[str, str], Tuple[int, float]]] = None,
+                 trusted_proxies: int = 0, sweep_interval: float = 60.0):
+        self.store = store if store is not None else MemoryBuckets()
+        self.limits = DEFAULT_LIMITS if limits is None else limits
+        self.trusted_proxies = trusted_proxies
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.check)
+
+    def client_ip(self) -> str:
+        """The client's address, skipping `trusted_proxies` proxies"""
+        addresses = [request.remote_addr or '']
+        if self.trusted_proxies:
+            forwarded = request.headers.get('X-Forwarded-For', '')
+            addresses = [a.strip() for a in forwarded.split(',') if a.strip()] + addresses
+            return addresses[max(len(addresses) - 1 - self.trusted_proxies, 0)]
+        return addresses[0]
+
+    def check(self):
+        rule = request.url_rule
+        limit = self.limits.get((request.method, rule.rule)) if rule else None
+        if limit is None:
+            return None
+
+        count, period = limit
+        now = time.time()
+        try:
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.sweep_interval
+                self.store.sweep(now)
+            wait = self.store.take(f"{request.method} {rule.rule} {self.client_ip()}",
+                                   now, period / count, period)
+        except sqlite3.Error:
+            return None
+        if not wait:
+            return None
+
+        response = jsonify({'success': False, 'error': 'Too many requests, please try again later'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(math.ceil(wait))
+        return response
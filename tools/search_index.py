@@ -0,0 +1,206 @@
+"""
+Search Index for Rudransh Tailoring
+In-memory inverted index over gallery titles, descriptions and file names
+(Hindi and English), with prefix matching
+"""
+
+import re
+import bisect
+import threading
+import unicodedata
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+# Prefixes shorter than this only match whole words ('a' would match everything)
+MIN_PREFIX = 2
+
+# Devanagari runs (letters plus vowel signs, virama and nukta, which Python's
+# \w does not treat as word characters, so r'\w+' splits 'ब्लाउज़' into pieces)
+# or runs of any other letters and digits. Danda (।, ॥) separates.
+TOKEN_RE = re.compile(r'[\u0900-\u0963\u0966-\u097F\uA8E0-\uA8FF]+|[^\W_]+')
+
+# Spellings customers type interchangeably: nukta dropped (ज़ -> ज),
+# chandrabindu written as anusvara (ँ -> ं), invisible joiners removed
+_FOLD = str.maketrans({'\u093C': None, '\u0901': '\u0902', '\u200C': None, '\u200D': None})
+
+# (id, category, uploaded_at, title, description, original_filename)
+Document = Tuple[str, str, str, str, str, str]
+
+
+def tokenize(text: Any) -> List[str]:
+    """Lower-cased, normalized words of a Hindi/English text ('IMG_0042.jpg' -> img, 0042, jpg)"""
+    text = unicodedata.normalize('NFC', str(text or '')).casefold().translate(_FOLD)
+    return TOKEN_RE.findall(text)
+
+
+def document(image: Dict[str, Any]) -> Document:
+    """The parts of an image record the index looks at"""
+    return (image['id'], image.get('category', ''), image.get('uploaded_at', ''),
+            image.get('title', ''), image.get('description', ''),
+            image.get('original_filename', ''))
+
+
+class SearchIndex:
+    """
+    Inverted index: word -> set of document numbers, for all fields and
+    for titles alone, plus the sorted word list for prefix lookups.
+
+    Each image gets a document number in upload order (kept when the
+    image is updated), so "newest first" is just the larger number and
+    matching is set unions and intersections of integers.
+
+    Images are added and removed one at a time (`apply()` after a write
+    in this process), so a change never rebuilds the index. `sync()`
+    catches up after writes by other processes, touching only the images
+    that differ. `version` is the store version the index reflects.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version: Optional[int] = None
+        self.numbers: Dict[str, int] = {}
+        self.docs: Dict[int, Document] = {}
+        self.postings: Dict[str, Set[int]] = {}
+        self.title_postings: Dict[str, Set[int]] = {}
+        self.by_category: Dict[str, Set[int]] = {}
+        self.terms: List[str] = []
+        self._next_number = 0
+
+    # ---------- Maintenance ----------
+
+    @staticmethod
+    def _words(doc: Document) -> Tuple[Set[str], Set[str]]:
+        """(words of all fields, words of the title)"""
+        title = set(tokenize(doc[3]))
+        return title.union(tokenize(doc[4]), tokenize(doc[5])), title
+
+    def _add(self, doc: Document):
+        number = self.numbers.get(doc[0])
+        if number is None:
+            number = self.numbers[doc[0]] = self._next_number
+            self._next_number += 1
+        else:
+            self._unindex(number)
+        self.docs[number] = doc
+        words, title = self._words(doc)
+        for term in words:
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = set()
+                bisect.insort(self.terms, term)
+            posting.add(number)
+        for term in title:
+            self.title_postings.setdefault(term, set()).add(number)
+        self.by_category.setdefault(doc[1], set()).add(number)
+
+    def _remove(self, image_id: str):
+        number = self.numbers.pop(image_id, None)
+        if number is not None:
+            self._unindex(number)
+
+    def _unindex(self, number: int):
+        doc = self.docs.pop(number)
+        words, title = self._words(doc)
+        for term in words:
+            posting = self.postings[term]
+            posting.discard(number)
+            if not posting:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+        for term in title:
+            posting = self.title_postings[term]
+            posting.discard(number)
+            if not posting:
+                del self.title_postings[term]
+        category = self.by_category[doc[1]]
+        category.discard(number)
+        if not category:
+            del self.by_category[doc[1]]
+
+    def apply(self, added: Iterable[Dict[str, Any]], removed: Iterable[str],
+              expected_version: Optional[int], version: int) -> bool:
+        """
+        Index the images one write added (or changed) and drop the ones it
+        removed, if the index was current just before that write.
+        Returns: False if it was not (the next sync() catches up instead)
+        """
+        with self._lock:
+            if self.version is None or self.version != expected_version:
+                return False
+            for image_id in removed:
+                self._remove(image_id)
+            for image in added:
+                self._add(document(image))
+            self.version = version
+            return True
+
+    def sync(self, documents: Iterable[Document], version: int,
+             ids: Optional[Iterable[str]] = None):
+        """
+        Catch up with the store: index `documents` that are new or changed
+        and, if the full list of current `ids` is given, drop the images
+        that are gone
+        """
+        with self._lock:
+            changed = [doc for doc in documents
+                       if doc[0] not in self.numbers or self.docs[self.numbers[doc[0]]] != doc]
+            if ids is not None:
+                current = set(ids)
+                for image_id in [i for i in self.numbers if i not in current]:
+                    self._remove(image_id)
+            # Oldest first, so new document numbers follow upload order
+            for doc in sorted(changed, key=lambda doc: (doc[2], doc[0])):
+                self._add(doc)
+            self.version = version
+
+    # ---------- Queries ----------
+
+    def _matches(self, token: str) -> Tuple[Set[int], Set[int]]:
+        """
+        (images with a word starting with `token`, those with it in the title).
+        The sets may be the index's own; callers must not modify them.
+        """
+        if len(token) < MIN_PREFIX:
+            terms = [token]
+        else:
+            start = bisect.bisect_left(self.terms, token)
+            end = bisect.bisect_left(self.terms, token + '\U0010FFFF', start)
+            terms = self.terms[start:end]
+        empty: Set[int] = frozenset()
+        if len(terms) == 1:
+            return self.postings.get(terms[0], empty), self.title_postings.get(terms[0], empty)
+        # map()/filter() keep the per-word loop in C; a prefix can expand to
+        # thousands of words (e.g. '2025' in camera file names)
+        return (set().union(*map(self.postings.__getitem__, terms)),
+                set().union(*filter(None, map(self.title_postings.get, terms))))
+
+    def search(self, query: str, category: Optional[str] = None,
+               limit: int = 20) -> Tuple[List[str], int]:
+        """
+        Image ids matching every word of `query` (each as a word prefix):
+        images matching in the title first, newest first within each group
+        Returns: (up to `limit` ids, total number of matches)
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return [], 0
+
+        with self._lock:
+            # Rarest word first keeps every intersection small
+            matches = sorted((self._matches(token) for token in tokens), key=lambda m: len(m[0]))
+            hits, title_hits = matches[0]
+            for more, more_title in matches[1:]:
+                if not hits:
+                    break
+                hits = hits & more
+                title_hits = title_hits & more_title
+            if category:
+                in_category = self.by_category.get(category, frozenset())
+                hits = hits & in_category
+                title_hits = title_hits & in_category
+
+            # Sets of small ints iterate almost in order, so sorted() finishes
+            # in about one pass (heapq.nlargest would hit its worst case)
+            best = sorted(title_hits)[:-limit - 1:-1]
+            if len(best) < limit:
+                best += sorted(hits - title_hits)[:-(limit - len(best)) - 1:-1]
+            return [self.docs[number][0] for number in best], len(hits)
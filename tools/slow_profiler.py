@@ -0,0 +1,110 @@
+"""
+Slow Request Profiler for Rudransh Tailoring
+Samples the stacks of in-flight requests and saves flamegraph-ready
+folded stacks for requests that turn out to be slow
+"""
+
+import os
+import re
+import sys
+import time
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class SlowRequestProfiler:
+    """
+    Statistical profiler for slow requests.
+
+    While requests are in flight, a background thread wakes every
+    `interval` seconds and records the current stack of each thread that
+    is handling one; with none in flight it sleeps until the next starts.
+    When a request takes at least `threshold` seconds its samples are
+    written to `<directory>/<time>-<ms>-<route>.folded`, one
+    "outer;...;inner count" line per distinct stack: the input format of
+    flamegraph.pl, speedscope and inferno. Fast requests cost only two
+    dictionary operations.
+    """
+
+    def __init__(self, directory: str = "profiles", threshold: float = 0.5,
+                 interval: float = 0.005, max_files: int = 500):
+        self.directory = Path(directory)
+        self.threshold = threshold
+        self.interval = interval
+        self.max_files = max_files
+        self._active: Dict[int, Counter] = {}
+        # Set while any request is being sampled
+        self._busy = threading.Event()
+        self._active_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Begin sampling the current (request) thread"""
+        self._ensure_sampler()
+        with self._active_lock:
+            self._active[threading.get_ident()] = Counter()
+            self._busy.set()
+
+    def stop(self, duration: float, name: str) -> Optional[Path]:
+        """Stop sampling the current thread; saves the stacks if the request was slow"""
+        with self._active_lock:
+            samples = self._active.pop(threading.get_ident(), None)
+            if not self._active:
+                self._busy.clear()
+        if not samples or duration < self.threshold:
+            return None
+        return self._write(samples, duration, name)
+
+    def _ensure_sampler(self):
+        """Start the sampling thread (again after a fork)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                # Fresh locks: a copy inherited through fork may be held
+                self._active = {}
+                self._busy = threading.Event()
+                self._active_lock = threading.Lock()
+                self._thread = threading.Thread(target=self._run, name='slow-request-profiler',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._busy.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for ident, samples in list(self._active.items()):
+                frame = frames.get(ident)
+                if frame is not None:
+                    samples[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame) -> str:
+        """Stack as 'outermost;...;innermost' function names"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _write(self, samples: Counter, duration: float, name: str) -> Optional[Path]:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if sum(1 for _ in self.directory.glob('*.folded')) >= self.max_files:
+                return None
+            slug = re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')
+            path = self.directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{int(duration * 1000)}ms-{slug}.folded"
+            with open(path, 'w', encoding='utf-8') as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            return path
+        except OSError as e:
+            print(f"Error saving profile of slow request: {e}")
+            return None
@@ -0,0 +1,699 @@
+"""
+Storage Backends for Rudransh Tailoring
+Pluggable persistence for gallery metadata and bookings (JSON or SQLite)
+"""
+
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Iterator, Tuple
+
+from booking_journal import BookingJournal
+from booking_index import phone_key
+from booking_rollups import Rollups, rollup_keys, add_count, empty_rollups, compute_rollups
+from file_lock import file_lock, atomic_write_json
+from metrics import timed
+from metadata_cache import MetadataCache, seek, count_image, compute_stats, copy_stats
+from search_index import Document, document
+from idempotency import CLAIM_TIMEOUT, Entry, ReplayFiles
+
+BACKENDS = ('json', 'sqlite')
+
+
+# ============== JSON Backend ==============
+
+class JsonImageStore:
+    """
+    Gallery metadata kept in a single JSON document (image_metadata.json).
+
+    Every read-modify-write runs under a thread lock and an exclusive
+    file lock (image_metadata.json.lock), re-reads the file from disk and
+    commits with an atomic replace, so several worker processes can write
+    without losing each other's changes.
+    """
+
+    def __init__(self, metadata_file: str = "image_metadata.json"):
+        self.metadata_file = Path(metadata_file)
+        self._cache = MetadataCache.for_file(self.metadata_file)
+        # Serializes read-modify-write cycles (variant workers write too)
+        self._write_lock = threading.RLock()
+
+    def list_images(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Images newest first, optionally for one category"""
+        index = self._cache.get()
+        if category:
+            return list(index.by_category.get(category, []))
+        return list(index.ordered)
+
+    def page_images(self, category: Optional[str] = None, limit: int = 20,
+                    after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` images older than the `after` (uploaded_at, id) key,
+        newest first
+        """
+        index = self._cache.get()
+        images = index.by_category.get(category, []) if category else index.ordered
+        start = seek(images, after) if after else 0
+        return images[start:start + limit]
+
+    def version(self) -> int:
+        """Counter bumped on every metadata change (used for ETags)"""
+        return self._cache.get().version
+
+    def get_image(self, image_id: str) -> Optional[Dict[str, Any]]:
+        return self._cache.get().by_id.get(image_id)
+
+    def search_documents(self, since: Optional[int] = None) -> List[Document]:
+        """
+        The searchable fields of the images (see search_index.py); all of
+        them, as the file keeps no per-image revision to filter on `since`
+        """
+        return [document(img) for img in self._cache.get().ordered]
+
+    def image_ids(self) -> List[str]:
+        return list(self._cache.get().by_id)
+
+    def add_image(self, image_data: Dict[str, Any]):
+        """Add an image; takes a reference on its content blob"""
+        self.add_images([image_data])
+
+    def add_images(self, images: List[Dict[str, Any]]):
+        """Add several images with a single metadata write"""
+        if not images:
+            return
+        with self._mutation() as index:
+            metadata = dict(index.metadata)
+            metadata['images'] = metadata.get('images', []) + list(images)
+            metadata['stats'] = stats = copy_stats(index.stats)
+            blobs = dict(metadata.get('blobs', {}))
+            for image_data in images:
+                count_image(stats, image_data)
+                blob = image_data.get('blob')
+                if blob:
+                    blobs[blob] = blobs.get(blob, 0) + 1
+            metadata['blobs'] = blobs
+            self._save_metadata_dict(metadata)
+
+    def update_image(self, image_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge `changes` into an image record; returns the updated record"""
+        with self._mutation() as index:
+            metadata = dict(index.metadata)
+            if image_id not in index.by_id:
+                return None
+            updated = None
+            images = []
+            for img in metadata['images']:
+                if img['id'] == image_id:
+                    previous = img
+                    img = updated = {**img, **changes}
+                images.append(img)
+            metadata['images'] = images
+            metadata['stats'] = stats = copy_stats(index.stats)
+            count_image(stats, previous, -1)
+            count_image(stats, updated)
+            self._save_metadata_dict(metadata)
+            return updated
+
+    def remove_image(self, image_id: str) -> Optional[Dict[str, Any]]:
+        """Remove image metadata and drop its blob reference; returns the removed record"""
+        return self.remove_images([image_id])[0]
+
+    def remove_images(self, image_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Remove several images with a single metadata write.
+        Returns: the removed record for each id (None if it did not exist)
+        """
+        with self._mutation() as index:
+            removed, gone = [], set()
+            for image_id in image_ids:
+                image = index.by_id.get(image_id)
+                if image is None or image_id in gone:
+                    removed.append(None)
+                else:
+                    removed.append(image)
+                    gone.add(image_id)
+            if not gone:
+                return removed
+
+            metadata = dict(index.metadata)
+            metadata['images'] = [img for img in metadata['images'] if img['id'] not in gone]
+            metadata['stats'] = stats = copy_stats(index.stats)
+            blobs = dict(metadata.get('blobs', {}))
+            for image in filter(None, removed):
+                count_image(stats, image, -1)
+                blob = image.get('blob')
+                if blob:
+                    if blobs.get(blob, 0) > 1:
+                        blobs[blob] -= 1
+                    else:
+                        blobs.pop(blob, None)
+            metadata['blobs'] = blobs
+            self._save_metadata_dict(metadata)
+            return removed
+
+    def blob_refs(self, blob: str) -> int:
+        """Number of images that reference a content blob"""
+        return self._load_metadata().get('blobs', {}).get(blob, 0)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Image count, byte total and per-category {count, bytes}.
+        Read from counters kept up to date by every write (no scan).
+        """
+        return self._cache.get().stats
+
+    def reconcile_stats(self) -> Dict[str, Any]:
+        """Rebuild the stored counters from the image records"""
+        with self._mutation() as index:
+            metadata = dict(index.metadata)
+            metadata['stats'] = compute_stats(metadata.get('images', []))
+            self._save_metadata_dict(metadata)
+            return metadata['stats']
+
+    def _load_metadata(self) -> Dict[str, Any]:
+        """
+        Load image metadata (served from the in-memory cache).
+        The returned dict is shared; copy before modifying.
+        """
+        return self._cache.get().metadata
+
+    @contextmanager
+    def _mutation(self):
+        """
+        Lock the metadata file and yield a freshly read index.
+        Raises: MetadataCorruptError rather than overwrite an unreadable file
+        """
+        with self._write_lock, file_lock(self.metadata_file):
+            yield self._cache.refresh()
+
+    @timed('metadata_save')
+    def _save_metadata_dict(self, metadata: Dict[str, Any]):
+        """Save metadata dict to JSON file (call inside `_mutation()`)"""
+        metadata['version'] = metadata.get('version', 0) + 1
+        atomic_write_json(self.metadata_file, metadata, indent=2, ensure_ascii=False)
+        self._cache.prime(metadata)
+
+
+# ============== SQLite Backend ==============
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id          TEXT PRIMARY KEY,
+    category    TEXT NOT NULL,
+    uploaded_at TEXT NOT NULL,
+    file_size   INTEGER NOT NULL DEFAULT 0,
+    data        TEXT NOT NULL,
+    rev         INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_images_uploaded ON images (uploaded_at, id);
+CREATE INDEX IF NOT EXISTS idx_images_category ON images (category, uploaded_at, id);
+
+CREATE TABLE IF NOT EXISTS image_stats (
+    category TEXT PRIMARY KEY,
+    count    INTEGER NOT NULL,
+    bytes    INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    name TEXT PRIMARY KEY,
+    refs INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    submitted_at TEXT,
+    phone        TEXT,
+    status       TEXT,
+    garment_type TEXT,
+    data         TEXT NOT NULL,
+    phone_key    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS booking_rollups (
+    period    TEXT NOT NULL,
+    bucket    TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    value     TEXT NOT NULL,
+    count     INTEGER NOT NULL,
+    PRIMARY KEY (period, bucket, dimension, value)
+);
+
+CREATE TABLE IF NOT EXISTS replays (
+    key         TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status      INTEGER,
+    body        TEXT,
+    expires_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_replays_expires ON replays (expires_at);
+"""
+
+# Created after any column upgrades, so they also work on older databases
+UPGRADE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_images_rev ON images (rev);
+CREATE INDEX IF NOT EXISTS idx_bookings_phone ON bookings (phone_key, id);
+CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings (lower(status), id);
+CREATE INDEX IF NOT EXISTS idx_bookings_garment ON bookings (lower(garment_type), id);
+CREATE INDEX IF NOT EXISTS idx_bookings_submitted ON bookings (submitted_at);
+"""
+
+
+class SqliteDatabase:
+    """
+    One SQLite file in WAL mode, with a connection per thread.
+    Connections are reopened after fork so pre-forking servers are safe.
+    """
+
+    _instances: Dict[str, 'SqliteDatabase'] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_file(cls, path: str) -> 'SqliteDatabase':
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(key)
+            return cls._instances[key]
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # A connection of its own, closed right away: under gunicorn's
+        # preload this runs in the master, and SQLite handles must not
+        # be carried into forked workers
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(SCHEMA)
+                self._upgrade(conn)
+                conn.executescript(UPGRADE_INDEXES)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _upgrade(conn: sqlite3.Connection):
+        """Add columns introduced after a database was created"""
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(images)')}
+        if 'rev' not in columns:
+            conn.execute('ALTER TABLE images ADD COLUMN rev INTEGER NOT NULL DEFAULT 0')
+
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(bookings)')}
+        if 'phone_key' not in columns:
+            conn.execute('ALTER TABLE bookings ADD COLUMN phone_key TEXT')
+            rows = conn.execute('SELECT id, phone FROM bookings').fetchall()
+            conn.executemany('UPDATE bookings SET phone_key = ? WHERE id = ?',
+                             [(phone_key(phone), row_id) for row_id, phone in rows])
+
+    def connect(self) -> sqlite3.Connection:
+        """Connection for the current thread (and process)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def disconnect(self):
+        """Close the current thread's connection (after setup work in a process that forks)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+
+class SqliteImageStore:
+    """Gallery metadata in an indexed SQLite table"""
+
+    def __init__(self, db_file: str = "rudransh.db"):
+        self.db = SqliteDatabase.for_file(db_file)
+        # Databases created before image_stats existed get counted once
+        ready = self.db.connect().execute(
+            "SELECT value FROM meta WHERE key = 'image_stats_ready'").fetchone()
+        if not ready:
+            self.reconcile_stats()
+        self.db.disconnect()
+
+    def list_images(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        conn = self.db.connect()
+        if category:
+            rows = conn.execute(
+                'SELECT data FROM images WHERE category = ? ORDER BY uploaded_at DESC, id DESC',
+                (category,))
+        else:
+            rows = conn.execute('SELECT data FROM images ORDER BY uploaded_at DESC, id DESC')
+        return [json.loads(data) for (data,) in rows]
+
+    def page_images(self, category: Optional[str] = None, limit: int = 20,
+                    after: Optional[Tuple[str, str]] = None) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if category:
+            where.append('category = ?')
+            params.append(category)
+        if after:
+            where.append('(uploaded_at, id) < (?, ?)')
+            params.extend(after)
+        sql = 'SELECT data FROM images'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY uploaded_at DESC, id DESC LIMIT ?'
+        params.append(limit)
+        return [json.loads(data) for (data,) in self.db.connect().execute(sql, params)]
+
+    def version(self) -> int:
+        row = self.db.connect().execute(
+            "SELECT value FROM meta WHERE key = 'images_version'").fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('images_version', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    def get_image(self, image_id: str) -> Optional[Dict[str, Any]]:
+        row = self.db.connect().execute(
+            'SELECT data FROM images WHERE id = ?', (image_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search_documents(self, since: Optional[int] = None) -> List[Document]:
+        """
+        The searchable fields of the images written after version `since`
+        (all images if None), extracted in SQL without parsing whole records
+        """
+        sql = ("SELECT id, category, uploaded_at, "
+               "COALESCE(json_extract(data, '$.title'), ''), "
+               "COALESCE(json_extract(data, '$.description'), ''), "
+               "COALESCE(json_extract(data, '$.original_filename'), '') FROM images")
+        params = []
+        if since is not None:
+            sql += ' WHERE rev > ?'
+            params.append(since)
+        return [tuple(row) for row in self.db.connect().execute(sql, params)]
+
+    def image_ids(self) -> List[str]:
+        return [image_id for (image_id,) in self.db.connect().execute('SELECT id FROM images')]
+
+    def add_image(self, image_data: Dict[str, Any]):
+        self.add_images([image_data])
+
+    def add_images(self, images: List[Dict[str, Any]]):
+        """Add several images in one transaction"""
+        if not images:
+            return
+        with self.db.connect() as conn:
+            for image_data in images:
+                self._insert(conn, image_data)
+                self._count(conn, image_data, 1)
+                if image_data.get('blob'):
+                    conn.execute(
+                        'INSERT INTO blobs (name, refs) VALUES (?, 1) '
+                        'ON CONFLICT(name) DO UPDATE SET refs = refs + 1', (image_data['blob'],))
+            self._bump_version(conn)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, image_data: Dict[str, Any]):
+        # rev: the version this write will bump images_version to
+        conn.execute(
+            'INSERT OR REPLACE INTO images (id, category, uploaded_at, file_size, data, rev) '
+            "VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(value), 0) + 1 FROM meta "
+            "WHERE key = 'images_version'))",
+            (image_data['id'], image_data.get('category', 'other'),
+             image_data.get('uploaded_at', ''), image_data.get('file_size', 0),
+             json.dumps(image_data, ensure_ascii=False)))
+
+    def update_image(self, image_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self.db.connect() as conn:
+            row = conn.execute('SELECT data FROM images WHERE id = ?', (image_id,)).fetchone()
+            if not row:
+                return None
+            previous = json.loads(row[0])
+            updated = {**previous, **changes}
+            self._insert(conn, updated)
+            self._count(conn, previous, -1)
+            self._count(conn, updated, 1)
+            self._bump_version(conn)
+        return updated
+
+    def remove_image(self, image_id: str) -> Optional[Dict[str, Any]]:
+        return self.remove_images([image_id])[0]
+
+    def remove_images(self, image_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Remove several images in one transaction; None for ids that did not exist"""
+        removed = []
+        with self.db.connect() as conn:
+            for image_id in image_ids:
+                row = conn.execute('SELECT data FROM images WHERE id = ?', (image_id,)).fetchone()
+                if not row:
+                    removed.append(None)
+                    continue
+                image = json.loads(row[0])
+                conn.execute('DELETE FROM images WHERE id = ?', (image_id,))
+                self._count(conn, image, -1)
+                if image.get('blob'):
+                    conn.execute('UPDATE blobs SET refs = refs - 1 WHERE name = ?', (image['blob'],))
+                    conn.execute('DELETE FROM blobs WHERE name = ? AND refs <= 0', (image['blob'],))
+                removed.append(image)
+            if any(removed):
+                self._bump_version(conn)
+        return removed
+
+    def blob_refs(self, blob: str) -> int:
+        row = self.db.connect().execute('SELECT refs FROM blobs WHERE name = ?', (blob,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, image: Dict[str, Any], sign: int):
+        """Adjust the per-category counters for one added (+1) or removed (-1) image"""
+        category = image.get('category', 'other')
+        conn.execute(
+            'INSERT INTO image_stats (category, count, bytes) VALUES (?, ?, ?) '
+            'ON CONFLICT(category) DO UPDATE SET count = count + excluded.count, '
+            'bytes = bytes + excluded.bytes',
+            (category, sign, image.get('file_size', 0) * sign))
+        conn.execute('DELETE FROM image_stats WHERE category = ? AND count <= 0', (category,))
+
+    def summary(self) -> Dict[str, Any]:
+        """Image count, byte total and per-category {count, bytes} (one row per category)"""
+        rows = self.db.connect().execute('SELECT category, count, bytes FROM image_stats').fetchall()
+        return {
+            'total_images': sum(count for _, count, _ in rows),
+            'total_size': sum(size for _, _, size in rows),
+            'categories': {cat: {'count': count, 'bytes': size} for cat, count, size in rows}
+        }
+
+    def reconcile_stats(self) -> Dict[str, Any]:
+        """Rebuild the counters table from the images table"""
+        with self.db.connect() as conn:
+            conn.execute('DELETE FROM image_stats')
+            conn.execute(
+                'INSERT INTO image_stats (category, count, bytes) '
+                'SELECT category, COUNT(*), COALESCE(SUM(file_size), 0) FROM images GROUP BY category')
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('image_stats_ready', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = 1")
+        return self.summary()
+
+
+class SqliteBookingStore:
+    """Bookings in a SQLite table (same interface as BookingJournal)"""
+
+    def __init__(self, db_file: str = "rudransh.db"):
+        self.db = SqliteDatabase.for_file(db_file)
+        # Databases created before booking_rollups existed get counted once
+        ready = self.db.connect().execute(
+            "SELECT value FROM meta WHERE key = 'booking_rollups_ready'").fetchone()
+        if not ready:
+            self.rebuild_rollups()
+        self.db.disconnect()
+
+    @timed('booking_write')
+    def append(self, record: Dict[str, Any]) -> None:
+        with self.db.connect() as conn:
+            self._insert(conn, record)
+
+    @timed('booking_write')
+    def append_many(self, records: List[Dict[str, Any]]) -> None:
+        """Insert a batch of bookings in one transaction"""
+        with self.db.connect() as conn:
+            for record in records:
+                self._insert(conn, record)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, record: Dict[str, Any]):
+        conn.execute(
+            'INSERT INTO bookings (submitted_at, phone, status, garment_type, data, phone_key) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (record.get('submitted_at'), record.get('phone'), record.get('status'),
+             record.get('garment_type'), json.dumps(record, ensure_ascii=False),
+             phone_key(record.get('phone'))))
+        conn.executemany(
+            'INSERT INTO booking_rollups (period, bucket, dimension, value, count) '
+            'VALUES (?, ?, ?, ?, 1) ON CONFLICT(period, bucket, dimension, value) '
+            'DO UPDATE SET count = count + 1', list(rollup_keys(record)))
+
+    def rollups(self) -> Rollups:
+        """Booking counters per day, month and delivery date"""
+        rollups = empty_rollups()
+        for period, bucket, dimension, value, count in self.db.connect().execute(
+                'SELECT period, bucket, dimension, value, count FROM booking_rollups'):
+            add_count(rollups, (period, bucket, dimension, value), count)
+        return rollups
+
+    def rebuild_rollups(self) -> Rollups:
+        """Recompute the rollups table with one streaming pass over the bookings"""
+        with self.db.connect() as conn:
+            # Inside the transaction, so no booking is added between scan and write
+            conn.execute('BEGIN IMMEDIATE')
+            rollups = compute_rollups(json.loads(data) for (data,) in
+                                      conn.execute('SELECT data FROM bookings ORDER BY id'))
+            conn.execute('DELETE FROM booking_rollups')
+            conn.executemany(
+                'INSERT INTO booking_rollups (period, bucket, dimension, value, count) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(period, bucket, dimension, value, count)
+                 for period, buckets in rollups.items()
+                 for bucket, counts in buckets.items()
+                 for dimension, values in counts.items()
+                 for value, count in values.items()])
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('booking_rollups_ready', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = 1")
+        return rollups
+
+    def query(self, filters: Dict[str, str], limit: int = 20,
+              before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` bookings matching `filters` with id < `before`, newest first
+        (filters as for BookingIndex.query; each one is served by an index)
+        """
+        where, params = [], []
+        for field, clause in (('phone', 'phone_key = ?'), ('status', 'lower(status) = ?'),
+                              ('garment_type', 'lower(garment_type) = ?'),
+                              ('date_from', 'submitted_at >= ?')):
+            if field in filters:
+                where.append(clause)
+                params.append(filters[field])
+        if 'date_to' in filters:
+            # Inclusive: '2026-02-20' also matches '2026-02-20T18:30:00'
+            where.append('submitted_at <= ?')
+            params.append(filters['date_to'] + '\uffff')
+        if before is not None:
+            where.append('id < ?')
+            params.append(before)
+        sql = 'SELECT id, data FROM bookings'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        return [{'id': row_id, **json.loads(data)}
+                for row_id, data in self.db.connect().execute(sql, params)]
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Stream every booking, oldest first"""
+        cursor = self.db.connect().execute('SELECT data FROM bookings ORDER BY id')
+        for (data,) in cursor:
+            yield json.loads(data)
+
+    def flush(self) -> None:
+        """Commits are already durable; nothing buffered"""
+
+    def close(self) -> None:
+        self.flush()
+
+    def compact(self) -> int:
+        """Checkpoint the WAL; returns the booking count"""
+        conn = self.db.connect()
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0]
+
+
+class SqliteReplayStore:
+    """Idempotency answers in a SQLite table (same interface as ReplayFiles)"""
+
+    def __init__(self, db_file: str = "rudransh.db"):
+        self.db = SqliteDatabase.for_file(db_file)
+
+    def claim(self, key: str, fingerprint: str, now: float) -> Optional[Entry]:
+        """
+        Take the key for this request unless a live entry exists
+        Returns: None if claimed, else the existing entry
+        """
+        with self.db.connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT fingerprint, status, body, expires_at FROM replays '
+                'WHERE key = ? AND expires_at > ?', (key, now)).fetchone()
+            if row:
+                fingerprint, status, body, expires_at = row
+                return fingerprint, status, json.loads(body) if body else None, expires_at
+            conn.execute(
+                'INSERT OR REPLACE INTO replays (key, fingerprint, status, body, expires_at) '
+                'VALUES (?, ?, NULL, NULL, ?)', (key, fingerprint, now + CLAIM_TIMEOUT))
+            return None
+
+    def complete(self, key: str, fingerprint: str, status: int,
+                 body: Dict[str, Any], expires_at: float):
+        """Store the response to replay until `expires_at`"""
+        with self.db.connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO replays (key, fingerprint, status, body, expires_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, fingerprint, status, json.dumps(body, ensure_ascii=False), expires_at))
+
+    def release(self, key: str):
+        """Drop a claim whose request was not answered (it may be retried)"""
+        with self.db.connect() as conn:
+            conn.execute('DELETE FROM replays WHERE key = ?', (key,))
+
+    def sweep(self, now: float) -> int:
+        """Delete expired entries; returns how many"""
+        with self.db.connect() as conn:
+            return conn.execute('DELETE FROM replays WHERE expires_at <= ?', (now,)).rowcount
+
+
+# ============== Factory ==============
+
+def get_backend() -> str:
+    """Backend selected by the STORAGE_BACKEND environment variable"""
+    backend = os.getenv('STORAGE_BACKEND', 'json').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}'. Use one of: {', '.join(BACKENDS)}")
+    return backend
+
+
+def open_image_store(backend: Optional[str] = None, metadata_file: str = "image_metadata.json",
+                     db_file: Optional[str] = None):
+    """Create the gallery metadata store for a backend"""
+    backend = backend or get_backend()
+    if backend == 'sqlite':
+        return SqliteImageStore(db_file or os.getenv('DATABASE_FILE', 'rudransh.db'))
+    return JsonImageStore(metadata_file)
+
+
+def open_booking_store(backend: Optional[str] = None, bookings_file: str = "bookings.jsonl",
+                       db_file: Optional[str] = None):
+    """Create the booking store for a backend"""
+    backend = backend or get_backend()
+    if backend == 'sqlite':
+        return SqliteBookingStore(db_file or os.getenv('DATABASE_FILE', 'rudransh.db'))
+    return BookingJournal(bookings_file)
+
+
+def open_replay_store(backend: Optional[str] = None, folder: str = "bookings.replays",
+                      db_file: Optional[str] = None):
+    """Create the shared idempotency store for a backend"""
+    backend = backend or get_backend()
+    if backend == 'sqlite':
+        return SqliteReplayStore(db_file or os.getenv('DATABASE_FILE', 'rudransh.db'))
+    return ReplayFiles(folder)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Multi-Process Stress Test for Rudransh Tailoring
+Hammers the booking and upload endpoints from several processes at once
+and checks that no booking or image record was lost
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+TOOLS_DIR = Path(__file__).resolve().parent
+
+BOOKING = {
+    'name': 'Stress Test',
+    'address': '123 Main Street, Mumbai',
+    'phone': '9876543210',
+    'garment_type': 'Blouse',
+    'delivery_date': '2026-02-20'
+}
+
+
+def tiny_png(tag: str) -> bytes:
+    """A valid 1x1 PNG made unique by a text chunk (so uploads are not deduplicated)"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 2, 0, 0, 0)) +
+            chunk(b'tEXt', b'Comment\0' + tag.encode()) +
+            chunk(b'IDAT', zlib.compress(b'\x00\xc8\x4b\x6e')) +
+            chunk(b'IEND', b''))
+
+
+def worker(workdir: str, worker_id: int, requests: int, results):
+    """One simulated server process: alternate booking submits and uploads"""
+    import io
+
+    os.chdir(workdir)
+    sys.path.insert(0, str(TOOLS_DIR))
+    # Every simulated client has the same address; test storage, not throttling
+    os.environ['RATE_LIMIT_STORE'] = 'off'
+    import app as server
+
+    client = server.app.test_client()
+    failures = 0
+    for i in range(requests):
+        tag = f"w{worker_id}-{i}"
+
+        booking = dict(BOOKING, instructions=tag)
+        response = client.post('/api/booking/submit', json=booking)
+        if response.status_code != 200:
+            failures += 1
+
+        response = client.post('/api/gallery/upload', data={
+            'category': 'blouse',
+            'title': tag,
+            'image': (io.BytesIO(tiny_png(tag)), f'{tag}.png')
+        }, content_type='multipart/form-data')
+        if response.status_code != 200:
+            failures += 1
+
+    # multiprocessing skips atexit handlers, so drain queues explicitly
+    server.form_processor.bookings.close()
+    server.image_manager.variants.shutdown()
+    results.put(failures)
+
+
+def compactor(workdir: str, stop, interval: float):
+    """Compact the booking journal repeatedly while the workers write"""
+    os.chdir(workdir)
+    sys.path.insert(0, str(TOOLS_DIR))
+    from booking_journal import BookingJournal
+
+    journal = BookingJournal(os.environ['BOOKINGS_FILE'])
+    while not stop.is_set():
+        journal.compact()
+        time.sleep(interval)
+
+
+def verify(workdir: Path, expected_tags: set) -> list:
+    """Compare what is on disk with what the workers sent; returns problems"""
+    sys.path.insert(0, str(TOOLS_DIR))
+    from storage import open_image_store, open_booking_store
+
+    problems = []
+    os.chdir(workdir)
+
+    bookings = open_booking_store(bookings_file=os.environ['BOOKINGS_FILE'])
+    booking_tags = [b.get('instructions') for b in bookings.iter_records()]
+    rollups = bookings.rollups()
+    if rollups != bookings.rebuild_rollups():
+        problems.append("booking rollups differ from a rebuild")
+    bookings.close()
+    missing = expected_tags - set(booking_tags)
+    if missing:
+        problems.append(f"{len(missing)} booking(s) lost, e.g. {sorted(missing)[:3]}")
+    if len(booking_tags) != len(set(booking_tags)):
+        problems.append(f"{len(booking_tags) - len(set(booking_tags))} duplicate booking(s)")
+
+    images = open_image_store(metadata_file='image_metadata.json').list_images()
+    image_tags = [img['title'] for img in images]
+    missing = expected_tags - set(image_tags)
+    if missing:
+        problems.append(f"{len(missing)} image record(s) lost, e.g. {sorted(missing)[:3]}")
+    if len(image_tags) != len(set(image_tags)):
+        problems.append(f"{len(image_tags) - len(set(image_tags))} duplicate image record(s)")
+    for img in images:
+        if not Path(img['file_path']).exists():
+            problems.append(f"image {img['id']} has no file on disk")
+            break
+
+    if (workdir / 'image_metadata.json').exists():
+        with open(workdir / 'image_metadata.json', 'r', encoding='utf-8') as f:
+            json.load(f)  # must still be valid JSON
+
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent write stress test')
+    parser.add_argument('-p', '--processes', type=int, default=8, help='Writer processes')
+    parser.add_argument('-n', '--requests', type=int, default=50,
+                        help='Bookings (and uploads) per process')
+    parser.add_argument('--compact-every', type=float, default=0.2,
+                        help='Seconds between journal compactions (0 to disable)')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch folder')
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("🔨 Rudransh Tailoring - Concurrent Write Stress Test")
+    print("=" * 50)
+
+    workdir = Path(tempfile.mkdtemp(prefix='rudransh-stress-'))
+    os.environ['UPLOAD_FOLDER'] = str(workdir / 'uploads')
+    os.environ['BOOKINGS_FILE'] = str(workdir / 'bookings.jsonl')
+    os.environ.setdefault('DATABASE_FILE', str(workdir / 'rudransh.db'))
+
+    # Start from built rollups, so the final check covers counts carried
+    # across every write and compaction rather than one fresh scan
+    sys.path.insert(0, str(TOOLS_DIR))
+    from storage import open_booking_store
+    open_booking_store(bookings_file=os.environ['BOOKINGS_FILE']).rebuild_rollups()
+
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    stop = ctx.Event()
+
+    started = time.perf_counter()
+    procs = [ctx.Process(target=worker, args=(str(workdir), n, args.requests, results))
+             for n in range(args.processes)]
+    for proc in procs:
+        proc.start()
+
+    compact_proc = None
+    if args.compact_every > 0 and os.getenv('STORAGE_BACKEND', 'json').lower() == 'json':
+        compact_proc = ctx.Process(target=compactor, args=(str(workdir), stop, args.compact_every))
+        compact_proc.start()
+
+    failures = sum(results.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+    stop.set()
+    if compact_proc:
+        compact_proc.join()
+    elapsed = time.perf_counter() - started
+
+    expected = {f"w{n}-{i}" for n in range(args.processes) for i in range(args.requests)}
+    problems = verify(workdir, expected)
+
+    print(f"  Processes:        {args.processes}")
+    print(f"  Bookings/uploads: {len(expected)} each")
+    print(f"  Failed requests:  {failures}")
+    print(f"  Elapsed:          {elapsed:.1f}s")
+    print(f"  Scratch folder:   {workdir}")
+
+    if not args.keep:
+        import shutil
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures or problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("✅ No records lost")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Streaming Uploads for Rudransh Tailoring
+Writes multipart file uploads straight to disk with size and content checks
+"""
+
+import io
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from flask import Request, current_app
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+
+from file_lock import NEW_FILE_MODE
+
+# Leading bytes of each accepted image format
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+SNIFF_BYTES = 12
+
+# Canonical file extension for each detected format
+IMAGE_EXTENSIONS = {'png': 'png', 'jpeg': 'jpg', 'gif': 'gif', 'webp': 'webp'}
+
+
+def content_hash():
+    """Hash used to name uploaded files by their content"""
+    return hashlib.blake2b(digest_size=16)
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """Detect the image format from the first bytes of a file"""
+    for signature, kind in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return kind
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+class UploadFile:
+    """
+    Writable temp file used by the multipart parser for one uploaded file.
+
+    Chunks go straight to disk, so memory per upload stays at one parser
+    chunk. A file that grows past `max_size`, or whose first bytes match
+    no known image signature, is dropped as soon as that is known: `error`
+    records why and the rest of its part is discarded unread, so the other
+    files of a batch upload still go through. The content hash is computed
+    on the way through (`digest`), so deduplication needs no second pass.
+    `claim()` moves the finished file into place; unclaimed files are
+    removed when the request closes them.
+    """
+
+    def __init__(self, folder: Path, max_size: int):
+        fd, name = tempfile.mkstemp(dir=folder, suffix='.part')
+        self.name = name
+        self.max_size = max_size
+        self.size = 0
+        self.kind: Optional[str] = None
+        self.error: Optional[HTTPException] = None
+        self._file = os.fdopen(fd, 'w+b')
+        self._header = b''
+        self._hash = content_hash()
+        self._claimed = False
+
+    @property
+    def digest(self) -> str:
+        """Hex content hash of everything written so far"""
+        return self._hash.hexdigest()
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.error is not None:
+            return len(data)
+        if self.size > self.max_size:
+            max_mb = self.max_size / (1024 * 1024)
+            return self._reject(RequestEntityTooLarge(f"File too large. Maximum size: {max_mb}MB"), data)
+
+        if self.kind is None:
+            self._header += data[:SNIFF_BYTES]
+            if len(self._header) >= SNIFF_BYTES:
+                self.kind = sniff_image_type(self._header)
+                if self.kind is None:
+                    return self._reject(UnsupportedMediaType('File content is not a supported image'), data)
+
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def _reject(self, error: HTTPException, data: bytes) -> int:
+        """Drop the file written so far; the rest of the part is skipped"""
+        self.error = error
+        self.close()
+        # The parser still seeks the part's file once it ends
+        self._file = io.BytesIO()
+        return len(data)
+
+    def claim(self, target: Path):
+        """Atomically move the upload to its final path"""
+        self._file.flush()
+        # Readable like any other stored file (nginx may serve it directly)
+        os.chmod(self.name, NEW_FILE_MODE)
+        os.replace(self.name, target)
+        self._claimed = True
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self._claimed and os.path.exists(self.name):
+            os.unlink(self.name)
+
+    def __getattr__(self, name):
+        # read/seek/tell/flush/etc. go to the underlying file
+        return getattr(self._file, name)
+
+
+class StreamingUploadRequest(Request):
+    """
+    Flask request class that streams file parts into UploadFile.
+    Every temp file it creates is closed (and, unless claimed, removed)
+    when the request ends, including those of a multipart body whose
+    parsing was aborted before `request.files` was filled in.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_files: List[UploadFile] = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        upload = UploadFile(current_app.config['UPLOAD_TMP_FOLDER'],
+                            current_app.config['MAX_UPLOAD_SIZE'])
+        self.upload_files.append(upload)
+        return upload
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for upload in self.upload_files:
+                upload.close()
+            self.upload_files = []
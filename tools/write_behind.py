@@ -0,0 +1,163 @@
+"""
+Write-Behind Booking Store for Rudransh Tailoring
+Queues booking writes for a background thread that flushes them in batches
+"""
+
+import os
+import queue
+import threading
+from typing import Dict, List, Any, Iterator, Optional
+
+DURABILITY_MODES = ('enqueue', 'flush')
+
+
+class WriteBehindStore:
+    """
+    Wraps a booking store (BookingJournal or SqliteBookingStore) so that
+    `append()` only puts the record on a bounded in-process queue. A
+    dedicated writer thread drains the queue and writes everything that
+    accumulated with a single `append_many()` call.
+
+    durability='enqueue' acknowledges as soon as the record is queued;
+    durability='flush' waits until the batch containing it is written.
+    `close()` drains the queue before closing the wrapped store.
+    """
+
+    def __init__(self, store, durability: str = 'enqueue', max_queue: int = 10000,
+                 max_batch: int = 500, put_timeout: float = 5.0):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability '{durability}'. Use one of: {', '.join(DURABILITY_MODES)}")
+        self.store = store
+        self.durability = durability
+        self.max_batch = max_batch
+        self.put_timeout = put_timeout
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    # ---------- Producer side ----------
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Queue records for writing.
+        Raises: queue.Full if the writer is too far behind,
+                the store's error in 'flush' mode if the write failed
+        """
+        if not records:
+            return
+        if self._closed:
+            raise RuntimeError("Booking store is closed")
+        self._ensure_writer()
+
+        done = threading.Event() if self.durability == 'flush' else None
+        item = {'records': records, 'done': done, 'error': None}
+        self._queue.put(item, timeout=self.put_timeout)
+
+        if done is not None:
+            done.wait()
+            if item['error'] is not None:
+                raise item['error']
+
+    def _ensure_writer(self):
+        """Start the writer thread (again after a fork)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='booking-writer', daemon=True)
+                self._thread.start()
+
+    # ---------- Writer thread ----------
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Coalesce whatever else is already waiting into one write
+            batch = [item]
+            count = len(item['records'])
+            stop = False
+            while count < self.max_batch:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+                count += len(nxt['records'])
+
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        records = [record for item in batch for record in item['records']]
+        error = None
+        try:
+            self.store.append_many(records)
+        except Exception as e:
+            error = e
+            print(f"Error writing {len(records)} booking(s): {e}")
+
+        for item in batch:
+            item['error'] = error
+            if item['done'] is not None:
+                item['done'].set()
+
+    # ---------- Store interface ----------
+
+    def _drain(self) -> None:
+        """Wait until everything queued so far has been handed to the store"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            marker = threading.Event()
+            self._queue.put({'records': [], 'done': marker, 'error': None})
+            marker.wait()
+
+    def flush(self) -> None:
+        """Wait until everything queued so far has been written"""
+        self._drain()
+        self.store.flush()
+
+    def query(self, filters: Dict[str, str], limit: int = 20,
+              before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Query stored bookings (after writing anything still queued; no fsync needed)"""
+        self._drain()
+        return self.store.query(filters, limit, before)
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Stream stored bookings (after writing anything still queued)"""
+        self.flush()
+        return self.store.iter_records()
+
+    def rollups(self):
+        """Analytics rollups (after writing anything still queued)"""
+        self._drain()
+        return self.store.rollups()
+
+    def rebuild_rollups(self):
+        self.flush()
+        return self.store.rebuild_rollups()
+
+    def compact(self) -> int:
+        self.flush()
+        return self.store.compact()
+
+    def close(self) -> None:
+        """Drain the queue, stop the writer and close the wrapped store"""
+        if not self._closed:
+            self._closed = True
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                self._queue.put(None)
+                self._thread.join()
+        self.store.close()
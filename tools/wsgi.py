@@ -0,0 +1,9 @@
+"""
+WSGI Entry Point for Rudransh Tailoring
+Used by production servers, e.g. `gunicorn -c gunicorn.conf.py wsgi:application`
+"""
+
+from app import app
+
+# Most WSGI servers look for `application` by default
+application = app